@@ -0,0 +1,81 @@
+# --------------------------------------------------------------------
+# collector.py: Micro-benchmark for subprocess output collection.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+"""
+Compare lines/sec of the chunked ShellOutputCollector against the
+previous implementation, which awaited a readline() task per line.
+
+Usage, from the repository root: python -m bench.collector [LINES]
+"""
+import asyncio
+import sys
+import time
+
+from panifex.shell import InMemoryOutputSink, ShellOutputCollector
+from panifex.util import decode
+
+
+# --------------------------------------------------------------------
+class ReadlineOutputCollector:
+    """The former ShellOutputCollector, kept here for comparison."""
+
+    def __init__(self):
+        self._readline_tasks = {}
+
+    def _setup_readline_task(self, stream, sink):
+        if stream is not None:
+            self._readline_tasks[asyncio.Task(stream.readline())] = (stream, sink)
+
+    async def collect(self, proc, sink):
+        self._setup_readline_task(proc.stdout, sink.out)
+        self._setup_readline_task(proc.stderr, sink.err)
+
+        while self._readline_tasks:
+            done, _ = await asyncio.wait(
+                self._readline_tasks, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                stream, sink_f = self._readline_tasks.pop(future)
+                line = future.result()
+                if line:
+                    sink_f(decode(line).strip())
+                    self._setup_readline_task(stream, sink_f)
+
+
+# --------------------------------------------------------------------
+async def run(collector, lines: int) -> float:
+    script = (
+        "import sys\n"
+        f"for i in range({lines}):\n"
+        "    (sys.stderr if i % 10 == 0 else sys.stdout).write("
+        "'src/module%d.cpp:42: warning: something happened here\\n' % i)\n"
+    )
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", script,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    sink = InMemoryOutputSink()
+    started = time.perf_counter()
+    await collector.collect(proc, sink)
+    await proc.wait()
+    elapsed = time.perf_counter() - started
+    assert sum(1 for _ in sink.output()) == lines
+    return elapsed
+
+
+# --------------------------------------------------------------------
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    for name, factory in (("readline", ReadlineOutputCollector),
+                          ("chunked", ShellOutputCollector)):
+        elapsed = asyncio.run(run(factory(), lines))
+        print(f"{name:>10}: {lines / elapsed:12,.0f} lines/sec ({elapsed:.3f}s)")
+
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+# --------------------------------------------------------------------
+# templates.py: Micro-benchmark for shell recipe command expansion.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+"""
+Compare recipes/sec of constructing shell recipes from a shared template
+and expanding their commands, against the previous expansion which
+quoted every parameter and environment variable, formatted the template
+and round-tripped the result through shlex.split() and shlex.join().
+The former figure only covers expansion, not constructing recipes.
+
+Usage, from the repository root: python -m bench.templates [RECIPES]
+"""
+import os
+import shlex
+import sys
+import time
+
+from panifex.shell import ShellRecipeFactory
+from panifex.util import is_iterable
+
+# --------------------------------------------------------------------
+TEMPLATE = "{CC} {CFLAGS} -MD -MF {depfile} -c {input} -o {output}"
+ARGV_TEMPLATE = ["{CC}", "{CFLAGS}", "-c", "{input}", "-o", "{output}"]
+
+
+# --------------------------------------------------------------------
+def expand_formerly(template: str, params, env) -> str:
+    """The former ShellRecipe._parse_command(), kept here for comparison."""
+    params = {**params, **env}
+    for k, v in params.items():
+        if is_iterable(v):
+            params[k] = " ".join([shlex.quote(str(x)) for x in v])
+        else:
+            params[k] = shlex.quote(str(v))
+    cmd = template.format(**params)
+    args = shlex.split(cmd)
+    return f" {args[0]} {shlex.join(args[1:])}"
+
+
+# --------------------------------------------------------------------
+def make_params(n: int):
+    return {"input": f"src/module{n}.cpp", "output": f"obj/module{n}.o",
+            "depfile": f"obj/module{n}.d"}
+
+
+# --------------------------------------------------------------------
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sh = ShellRecipeFactory()
+    sh.env(CC="clang++", CFLAGS=("-g", "-O2", "-I./include", "--std=c++2a"))
+    env = {**os.environ, "CC": "clang++", "CFLAGS": ("-g", "-O2", "-I./include", "--std=c++2a")}
+
+    started = time.perf_counter()
+    for n in range(count):
+        expand_formerly(TEMPLATE, make_params(n), env)
+    elapsed = time.perf_counter() - started
+    print(f"{'formerly':>10}: {count / elapsed:12,.0f} recipes/sec ({elapsed:.3f}s)")
+
+    for name, template in (("string", TEMPLATE), ("argv", ARGV_TEMPLATE)):
+        started = time.perf_counter()
+        for n in range(count):
+            sh(template, **make_params(n))._parse_command()
+        elapsed = time.perf_counter() - started
+        print(f"{name:>10}: {count / elapsed:12,.0f} recipes/sec ({elapsed:.3f}s)")
+
+
+# --------------------------------------------------------------------
+if __name__ == '__main__':
+    main()
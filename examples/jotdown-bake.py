@@ -9,7 +9,7 @@
 import shlex
 import subprocess
 from pathlib import Path
-from panifex import build, target, provide, default, seq, sh
+from panifex import build, target, provide, default, seq, sh, FileSet
 
 
 # -------------------------------------------------------------------
@@ -38,9 +38,10 @@ def check(cmd):
 # -------------------------------------------------------------------
 def compile_app(src, headers):
     return sh(
-        "{CC} {CFLAGS} {input} {LDFLAGS} -o {output}",
+        "{CC} {CFLAGS} -MD -MF {depfile} {input} {LDFLAGS} -o {output}",
         input=src,
         output=Path(src).with_suffix(""),
+        depfile=Path(src).with_suffix(".d"),
         includes=headers
     )
 
@@ -48,9 +49,10 @@ def compile_app(src, headers):
 # -------------------------------------------------------------------
 def compile_pybind11_module(src, headers):
     return sh(
-        "{CC} -O3 -shared -Wall -std=c++2a -fPIC {flags} {input} -o {output}",
+        "{CC} -O3 -shared -Wall -std=c++2a -fPIC {flags} -MD -MF {depfile} {input} -o {output}",
         input=src,
         output="jotdown%s" % check("python3-config --extension-suffix"),
+        depfile="jotdown.d",
         flags=INCLUDES + shlex.split(check("python-config --includes")),
         includes=headers
     )
@@ -65,19 +67,19 @@ def submodules():
 # -------------------------------------------------------------------
 @provide
 def headers():
-    return Path.cwd().glob("include/jotdown/*.h")
+    return FileSet("include/jotdown/*.h", root=Path.cwd())
 
 
 # -------------------------------------------------------------------
 @provide
 def demo_sources(submodules):
-    return Path.cwd().glob("demo/*.cpp")
+    return FileSet("demo/*.cpp", root=Path.cwd())
 
 
 # -------------------------------------------------------------------
 @target
 def demos(demo_sources, headers):
-    return [compile_app(src, headers) for src in demo_sources]
+    return (compile_app(src, headers) for src in demo_sources)
 
 
 # -------------------------------------------------------------------
@@ -92,13 +94,13 @@ def pybind11_tests(submodules):
 # -------------------------------------------------------------------
 @provide
 def test_sources(submodules):
-    return Path.cwd().glob("test/*.cpp")
+    return FileSet("test/*.cpp", root=Path.cwd())
 
 
 # -------------------------------------------------------------------
 @target
 def tests(test_sources, headers):
-    return [compile_app(src, headers) for src in test_sources]
+    return (compile_app(src, headers) for src in test_sources)
 
 
 # -------------------------------------------------------------------
@@ -113,7 +115,7 @@ def run_tests(tests):
 # -------------------------------------------------------------------
 @provide
 def pymodule_src(submodules):
-    return Path.cwd().glob("python/src/*.cpp")
+    return FileSet("python/src/*.cpp", root=Path.cwd())
 
 
 # -------------------------------------------------------------------
@@ -7,6 +7,61 @@
 # Released under a 3-clause BSD license, see LICENSE for more info.
 # -------------------------------------------------------------------
 
-from .build import build, default, provide, target, seq, keep, noclean
-from .shell import sh, ShellReport
-temp = build.temp
+import importlib
+import sys
+import types
+
+# -------------------------------------------------------------------
+# Exports are imported on first use, so that e.g. the `bake` runner
+# doesn't pay for importing the build engine and its dependencies
+# before it knows there's a script to run.
+_EXPORTS = {
+    "build": ".build",
+    "default": ".build",
+    "provide": ".build",
+    "target": ".build",
+    "seq": ".build",
+    "keep": ".build",
+    "noclean": ".build",
+    "pool": ".build",
+    "cpu": ".build",
+    "sh": ".shell",
+    "ShellReport": ".shell",
+    "InMemoryOutputSink": ".shell",
+    "SpoolOutputSink": ".shell",
+    "PythonRecipe": ".python",
+    "FileSet": ".fileset",
+    "ShellBatch": ".batch",
+}
+
+__all__ = [*_EXPORTS, "temp"]
+
+
+# -------------------------------------------------------------------
+def __getattr__(name):
+    if name == "temp":
+        value = __getattr__("build").temp
+    elif name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+# -------------------------------------------------------------------
+def __dir__():
+    return sorted({*globals(), *__all__})
+
+
+# -------------------------------------------------------------------
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # `build` is both a submodule and the engine exported under that
+        # name.  Don't let importing the submodule shadow the export.
+        if name in _EXPORTS and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
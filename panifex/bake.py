@@ -7,13 +7,76 @@
 # Distributed under terms of the MIT license.
 # --------------------------------------------------------------------
 
-import subprocess
+import os
+import runpy
 import sys
+from pathlib import Path
+from typing import Optional
+
+from .config import DEFAULT_DAEMON_SOCKET
+
+# --------------------------------------------------------------------
+BAKE_SCRIPT = "bake.py"
+DAEMON_FLAG = "--daemon"
+
+
+# --------------------------------------------------------------------
+def find_bake_script(start: Path) -> Optional[Path]:
+    """Find the nearest `bake.py` in `start` or any of its parents."""
+    for directory in (start, *start.parents):
+        script = directory / BAKE_SCRIPT
+        if script.is_file():
+            return script
+    return None
+
+
+# --------------------------------------------------------------------
+def run_bake_script(script: Path, args):
+    """
+    Run the given bake script in this interpreter, as if it were invoked
+    as `python bake.py args...` from its own directory.  Exits with the
+    script's exit code.
+    """
+    if script.parent != Path.cwd():
+        sys.stderr.write(f"bake: Entering directory '{script.parent}'\n")
+        os.chdir(script.parent)
+
+    sys.argv = [str(script), *args]
+    sys.path.insert(0, str(script.parent))
+    runpy.run_path(str(script), run_name="__main__")
+    sys.exit(0)
+
+
+# --------------------------------------------------------------------
+def serve_bake_script(script: Path):
+    """Keep the given bake script loaded and serve builds for it."""
+    from .daemon import BuildServer
+
+    os.chdir(script.parent)
+    sys.path.insert(0, str(script.parent))
+    BuildServer(script).serve()
 
 
 # --------------------------------------------------------------------
 def main():
-    subprocess.call(['python', 'bake.py', *sys.argv[1:]])
+    script = find_bake_script(Path.cwd())
+    if script is None:
+        sys.stderr.write(f"bake: No {BAKE_SCRIPT} found in this directory or any parent.\n")
+        sys.exit(1)
+
+    args = sys.argv[1:]
+    if DAEMON_FLAG in args:
+        serve_bake_script(script)
+        return
+
+    # The socket only exists while a build server is running.
+    if (script.parent / DEFAULT_DAEMON_SOCKET).exists():
+        from .daemon import request_build
+
+        code = request_build(script, args)
+        if code is not None:
+            sys.exit(code)
+    run_bake_script(script, args)
 
 
 # --------------------------------------------------------------------
@@ -0,0 +1,308 @@
+# --------------------------------------------------------------------
+# batch.py: Shell commands run once for many inputs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import asyncio
+import os
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .recipes import FileRecipe
+from .shell import EMPTY_ENV, SharedEnv, ShellFailed, ShellRecipe, ShellReport
+from .template import quote_param
+from .util import freeze, is_iterable
+
+# --------------------------------------------------------------------
+# How long to wait for more stale members before running a batch.
+BATCH_LINGER_SECONDS = 0.01
+# Room left in ARG_MAX for e.g. the exec'ed program's name, like xargs.
+ARG_MAX_HEADROOM = 2048
+# Linux limits each argument and environment string to 32 pages.  The
+# whole command line of a shell command is one argument to `sh -c`.
+MAX_ARG_STRLEN = 32 * 4096
+
+
+# --------------------------------------------------------------------
+def _arg_max() -> int:
+    try:
+        return os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError, OSError):
+        return MAX_ARG_STRLEN
+
+
+# --------------------------------------------------------------------
+def _items(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if is_iterable(value) else [value]
+
+
+# --------------------------------------------------------------------
+Fingerprint = Optional[Tuple[int, int, int]]
+
+
+# --------------------------------------------------------------------
+def _fingerprints(paths: Sequence[Any]) -> List[Fingerprint]:
+    fingerprints: List[Fingerprint] = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprints.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except OSError:
+            fingerprints.append(None)
+    return fingerprints
+
+
+# -------------------------------------------------------------------
+class BatchMember(FileRecipe):
+    """
+    One logical recipe of a `ShellBatch`.  It's up to date or not on its
+    own, like a `ShellRecipe` with the same command and parameters would
+    be, but it runs as part of a batch and shares the batch's command.
+    """
+
+    __slots__ = ("_batch", "_shell", "_stamp", "_run", "_leader", "_error")
+
+    def __init__(self, batch: "ShellBatch", shell: ShellRecipe, stamp=None):
+        super().__init__()
+        self._batch = batch
+        self._shell = shell
+        self._stamp = stamp
+        self._run: Optional[ShellRecipe] = None
+        self._leader = False
+        self._error: Optional[ShellFailed] = None
+
+    def _returncode(self) -> Optional[int]:
+        return None if self._run is None else self._run._returncode
+
+    async def _resolve(self) -> Any:
+        self._run, self._leader, self._error = await self._batch.submit(self)
+        if self._stamp is not None and self._error is None:
+            Path(self._stamp).parent.mkdir(parents=True, exist_ok=True)
+            Path(self._stamp).touch()
+            self.stats.invalidate(self._stamp)
+        self.finish()
+        return self.output()
+
+    def _check_success(self):
+        if self._error is not None:
+            raise self._error
+        if not self.succeeded():
+            # Name this member's part of the batch, not the whole command.
+            raise ShellFailed(replace(self.report(), cmd=self._shell._expand_command()))
+
+    def succeeded(self):
+        return self.is_done() and self._error is None
+
+    def title(self) -> str:
+        return self._shell.title()
+
+    def _decorated_title(self) -> str:
+        return self._shell._decorated_title()
+
+    def signature(self) -> Dict[str, Any]:
+        return self._shell.signature()
+
+    def _explain_change(self, name: str, old: Any, new: Any) -> str:
+        return self._shell._explain_change(name, old, new)
+
+    def input(self) -> Any:
+        return self._shell.input()
+
+    def output(self) -> Any:
+        if self._stamp is not None:
+            return [self._shell.output(), self._stamp]
+        return self._shell.output()
+
+    def report(self) -> ShellReport:
+        run = self._run if self._run is not None else self._shell
+        return ShellReport(
+            name=self._batch.name,
+            started=self.started,
+            finished=self.finished,
+            cmd=run._cmd,
+            # The batch's output is reported once, with its first member.
+            sink=run._sink if self._leader else None,
+            returncode=self._returncode() if self._error is not None else 0,
+        )
+
+
+# -------------------------------------------------------------------
+class ShellBatch:
+    """
+    A command for tools that take many files per run, e.g. `ar`, linters
+    or `protoc`.  Calling a ShellBatch with `input` and optionally
+    `output` returns a recipe for those files.  The stale ones are
+    collected and run together: `{input}` and `{output}` expand to the
+    files of every member of a batch.
+
+    Batches are kept within the system's argument length limits and at
+    most `max_batch` members, and each one runs as a single command that
+    takes one job slot.  If a batch's command fails, its members that
+    have outputs and wrote all of them during the run still succeed, like
+    the objects `cc -c` did compile.  The others fail.  Commands that
+    don't write outputs, like linters, can be given a `stamp` file per
+    member instead, which is touched when it succeeds.  As such commands
+    don't say which of their inputs failed, their whole batch fails.
+    """
+
+    def __init__(self, command, env: Mapping[str, Any] = EMPTY_ENV,
+                 max_batch: Optional[int] = None, **params):
+        self.command = command
+        self.name = "Shell Batch"
+        self.max_batch = max_batch
+        self._params = freeze(params)
+        self._env_base = env if isinstance(env, SharedEnv) else SharedEnv(env)
+        self._env: Dict[str, Any] = {}
+        self._pool: Optional[str] = None
+        self._pending: List[Tuple[BatchMember, asyncio.Future]] = []
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def with_env(self, env: Dict):
+        self._env.update(freeze(env))
+        return self
+
+    def with_name(self, name: str):
+        self.name = name
+        return self
+
+    def with_pool(self, pool: str):
+        """Run batches in the named job pool, see `build.pool()`."""
+        self._pool = pool
+        return self
+
+    def _shell(self, **params) -> ShellRecipe:
+        shell = ShellRecipe(self.command, **self._params, **params)
+        shell.with_base_env(self._env_base).with_env(self._env).with_name(self.name)
+        if self._pool is not None:
+            shell.with_pool(self._pool)
+        return shell
+
+    def __call__(self, input, output=None, stamp=None, includes=None) -> BatchMember:
+        params = dict(input=input, output=output, includes=includes)
+        shell = self._shell(**{k: v for k, v in params.items() if v is not None})
+        return BatchMember(self, shell, stamp)
+
+    async def submit(self, member: BatchMember) -> Tuple[ShellRecipe, bool, Optional[ShellFailed]]:
+        """
+        Queue a stale member, returning the recipe of the batch it ran in,
+        whether it was that batch's first member and the batch's error if
+        it failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((member, future))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+            # With --fail-fast, also terminate running batch commands.
+            member.jobs.on_halt(self._dispatcher.cancel)
+        return await future
+
+    async def _dispatch(self):
+        try:
+            # Members become stale one by one as their recipes are made.
+            # Wait until no more arrive, then run all of them.
+            while True:
+                count = len(self._pending)
+                await asyncio.sleep(BATCH_LINGER_SECONDS)
+                if len(self._pending) == count:
+                    break
+            pending, self._pending = self._pending, []
+        except asyncio.CancelledError:
+            for _, future in self._pending:
+                future.cancel()
+            self._pending = []
+            raise
+        finally:
+            self._dispatcher = None
+        try:
+            batches = list(self._batches(pending))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        await asyncio.gather(*(self._run(batch) for batch in batches))
+
+    def _batches(self, pending: List[Tuple[BatchMember, asyncio.Future]]):
+        """Split members into batches whose commands fit the limits."""
+        empty = self._shell(input=[], output=[])
+        base_cmd = len(empty._expand_command())
+        base_env = sum(len(k) + len(v) + 2 + 8 for k, v in empty._spawn_env().items())
+        limit = _arg_max() - ARG_MAX_HEADROOM - base_cmd - base_env
+        # Shell command lines are a single argument to `sh -c`.
+        cmd_limit = None if empty._template.is_argv() else MAX_ARG_STRLEN - base_cmd
+        weights = {name: empty._template.occurrences(name) for name in ("input", "output")}
+
+        batch: List[Tuple[BatchMember, asyncio.Future]] = []
+        sizes = dict.fromkeys(weights, 0)
+        for member, future in pending:
+            # Files are quoted into the command line, and the parameters
+            # are also exported joined into one environment variable each.
+            costs = {name: sum(len(quote_param(x)) + 1 for x in _items(member._shell._params.get(name)))
+                     for name in weights}
+            new = {name: sizes[name] + costs[name] for name in weights}
+            cmd = sum(weights[name] * new[name] for name in weights)
+            total = cmd + sum(new.values()) + 8 * len(batch)
+            if batch and (total > limit
+                          or (cmd_limit is not None and cmd > cmd_limit)
+                          or max(new.values()) > MAX_ARG_STRLEN
+                          or (self.max_batch is not None and len(batch) >= self.max_batch)):
+                yield batch
+                batch = []
+                new = costs
+            batch.append((member, future))
+            sizes = new
+        if batch:
+            yield batch
+
+    async def _run(self, batch: List[Tuple[BatchMember, asyncio.Future]]):
+        inputs = [x for m, _ in batch for x in _items(m._shell._input)]
+        outputs = [x for m, _ in batch for x in _items(m._shell._output)]
+        run = self._shell(input=inputs, **({"output": outputs} if outputs else {}))
+        loop = asyncio.get_running_loop()
+        try:
+            before = await loop.run_in_executor(None, _fingerprints, outputs)
+            await run._run_command()
+            failed = {m for m, _ in batch}
+            if run._returncode != 0 and outputs:
+                after = await loop.run_in_executor(None, _fingerprints, outputs)
+                failed = self._failed_members(batch, dict(zip(outputs, zip(before, after))))
+        except BaseException as e:
+            for _, future in batch:
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            # One error for the failed members, so it's reported only once.
+            error = None
+            if run._returncode != 0 and failed:
+                first = next(m for m, _ in batch if m in failed)._shell._expand_command()
+                more = f" and {len(failed) - 1} more" if len(failed) > 1 else ""
+                error = ShellFailed(replace(run.report(), cmd=first + more))
+            for n, (member, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result((run, n == 0, error if member in failed else None))
+
+    @staticmethod
+    def _failed_members(batch: List[Tuple[BatchMember, asyncio.Future]],
+                        changes: Dict[Any, Tuple[Fingerprint, Fingerprint]]) -> Set[BatchMember]:
+        """
+        The members of a failed batch that didn't write all of their
+        outputs during the run, or that have none.
+        """
+        failed = set()
+        for member, _ in batch:
+            outputs = _items(member._shell._output)
+            if not outputs or any(changes[x][1] is None or changes[x][0] == changes[x][1]
+                                  for x in outputs):
+                failed.add(member)
+        return failed
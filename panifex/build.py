@@ -8,22 +8,38 @@
 # --------------------------------------------------------------------
 
 import asyncio
+import atexit
 import inspect
 import logging
+import os
+import queue
 import sys
 import textwrap
 from collections import defaultdict
 from datetime import datetime
-from typing import Dict
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Union
 
 import xeno
 from ansilog import Formatter, bg, fg
 
+from .clean import Cleaner
 from .config import Config
-from .errors import AggregateError, BuildError
-from .recipes import Recipe, RecipeHistory
+from .db import BuildDatabase, FileDigests
+from .errors import AggregateError, BuildError, BuildHalted
+from .fileset import FileSet
+from .jobs import JobSlots
+from .recipes import Recipe, RecipeHistory, resource_inputs
+from .reports import ReportWriter
+from .shell import ShellRecipe, SpoolOutputSink
+from .stats import StatCache
 from .util import get_logger, is_iterable
 
+if TYPE_CHECKING:
+    from .cas import ArtifactCache
+    from .profile import Profiler
+
 # --------------------------------------------------------------------
 TARGET = "panifex.target"
 DEFAULT_TARGET = "panifex.default_target"
@@ -35,6 +51,14 @@ log = get_logger("panifex")
 file_logging_setup = False
 
 
+# -------------------------------------------------------------------
+class _PassthroughQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave formatting to the file handler, whose formatter decides
+        # whether to keep the colors.
+        return record
+
+
 # -------------------------------------------------------------------
 def _target(f):
     attrs = xeno.MethodAttributes.for_method(f, create=True, write=True)
@@ -69,14 +93,31 @@ class BuildEngine:
 
     def __init__(self, exit_on_error=True):
         self._exit_on_error = exit_on_error
+        # A resident engine serves many builds in one process, and keeps
+        # its build database in memory between them.
+        self.resident = False
+        self._defer_calls = False
+        self._database: Optional[BuildDatabase] = None
         self._initialize()
 
     def _initialize(self):
-        Recipe.cleaning = False
+        """Forget everything defined by the build script."""
         self._injector = xeno.Injector()
-        self._cache = {}
+        self._injector.add_async_injection_interceptor(self._intercept_coroutines)
+        self._pools: Dict[str, int] = {}
+        self._cycles_checked = False
+        self._ordered_dependencies: Dict[str, List[str]] = {}
+        self._reset()
+
+    def _reset(self, keep_cache=False):
+        """Forget the state of the last build."""
+        Recipe.cleaning = False
+        if not keep_cache:
+            self._cache = {}
+            self._inputs: Dict[str, Set[Union[Path, FileSet]]] = {}
         self._cache_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
         self._temps = []
+        self.stats = StatCache()
 
     def default(self, f):
         self._injector.provide(_default(f))
@@ -102,6 +143,19 @@ class BuildEngine:
     def keep(self, f):
         return _keep(f)
 
+    def cpu(self, f):
+        """
+        Make `f` return a recipe that runs it in a worker process, see
+        `PythonRecipe`.
+        """
+        from .python import cpu
+
+        return cpu(f)
+
+    def pool(self, name: str, size: int):
+        """Define a named job pool allowing at most `size` concurrent jobs."""
+        self._pools[name] = size
+
     # pylint: disable=R0201
     def noclean(self, f):
         @xeno.MethodAttributes.wraps(f)
@@ -120,11 +174,35 @@ class BuildEngine:
         filename = '%s-%s.log' % (config.log_to_file, datetime.today().isoformat())
         file_handler = logging.FileHandler(filename, mode='w')
         file_handler.setFormatter(Formatter(file_handler.stream))
-        log.addHandler(file_handler)
+        # Records are written by a listener thread, so that logging from
+        # the event loop never waits on the disk.
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        listener = QueueListener(records, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+        log.addHandler(_PassthroughQueueHandler(records))
         log.info("Logging to file: %s", filename)
 
+    def _check_for_cycles(self):
+        if not self._cycles_checked:
+            self._injector.check_for_cycles()
+            self._cycles_checked = True
+
+    def _get_ordered_dependencies(self, target):
+        if target not in self._ordered_dependencies:
+            self._ordered_dependencies[target] = self._injector.get_ordered_dependencies(target)
+        return self._ordered_dependencies[target]
+
+    def _load_database(self, config: Config) -> Optional[BuildDatabase]:
+        if not config.use_db:
+            return None
+        if self._database is None or self._database.path != Path(config.db_path):
+            self._database = BuildDatabase.load(config.db_path)
+        self._database.digests.stats = self.stats
+        return self._database
+
     def _list_targets(self):
-        self._injector.check_for_cycles()
+        self._check_for_cycles()
         targets = sorted(self._get_targets())
 
         for target in targets:
@@ -141,8 +219,11 @@ class BuildEngine:
             else:
                 print()
 
-    def __call__(self):
-        config = Recipe.config = Config().parse_args(self.name)
+    def __call__(self, args=None):
+        if self._defer_calls:
+            return None
+
+        config = Recipe.config = Config().parse_args(self.name, args)
 
         if config.list_targets:
             self._list_targets()
@@ -151,11 +232,29 @@ class BuildEngine:
         if len(config.log_to_file) > 0:
             self._setup_file_logging(config)
 
+        if config.watch and not (config.cleaning or config.clean_all or config.dry_run):
+            return self._watch(config)
+        return self._build(config)
+
+    def _build(self, config: Config, watching=False):
+        Recipe.config = config
+        if config.profile:
+            from .profile import Profiler
+            Recipe.profiler = Profiler()
+        if config.report and not (config.cleaning or config.clean_all or config.dry_run):
+            Recipe.report_writer = ReportWriter(config.report, self.name)
+
+        default_sink = ShellRecipe.default_sink
+        succeeded = False
         try:
             result = self._resolve_build(config)
+            succeeded = True
             log.info("")
             if Recipe.cleaning:
                 log.info(fg.green("CLEAN"))
+            elif config.dry_run:
+                count = sum(1 for r in RecipeHistory.get() if r.would_run)
+                log.info(fg.green("DRY RUN: ") + f"{count} recipe(s) would run")
             else:
                 log.info(fg.green("OK"))
             return result
@@ -165,15 +264,14 @@ class BuildEngine:
                 log.exception("Aggregate exception details >>>")
                 for err in e.errors:
                     log.info("")
-                    for err in e.errors:
-                        log.exception("Sub-exception >>>", exc_info=err)
-                else:
-                    for err in e.errors:
-                        log.error(f"{type(err).__name__}: {err}")
+                    log.exception("Sub-exception >>>", exc_info=err)
+            else:
+                for err in e.errors:
+                    log.error(f"{type(err).__name__}: {err}")
 
             log.info("")
             log.info(fg.white(bg.red("FAIL")))
-            if self._exit_on_error:
+            if self._exit_on_error and not watching:
                 sys.exit(1)
 
         except Exception as e:
@@ -184,19 +282,101 @@ class BuildEngine:
 
             log.info("")
             log.info(fg.white(bg.red("FAIL")))
-            if self._exit_on_error:
+            if self._exit_on_error and not watching:
                 sys.exit(1)
 
         finally:
+            if Recipe.profiler is not None:
+                self._write_profile(config, Recipe.profiler)
+                Recipe.profiler = None
+            if Recipe.database is not None:
+                Recipe.database.save()
+                Recipe.database = None
+            if Recipe.report_writer is not None:
+                Recipe.report_writer.close(
+                    succeeded, Recipe.artifacts.stats() if Recipe.artifacts else None)
+                log.info("Wrote report: %s", config.report)
+                Recipe.report_writer = None
+            if Recipe.artifacts is not None:
+                self._close_artifacts(Recipe.artifacts)
+                Recipe.artifacts = None
+            if not self.resident:
+                self._database = None
+            # Only builds with Python recipes have loaded their module.
+            python = sys.modules.get(f"{__package__}.python")
+            if python is not None:
+                python.PythonRecipe.shutdown()
             RecipeHistory.clear()
             Recipe.config = Config()
-            self._initialize()
+            Recipe.jobs = JobSlots()
+            ShellRecipe.default_sink = default_sink
+            self._reset(keep_cache=watching)
+
+    def _watch(self, config: Config):
+        """
+        Build, then wait for the inputs of the build's file recipes to
+        change and rebuild.  Only the resources that used the changed
+        files and the resources downstream of them are resolved again,
+        all others stay cached from the previous build.
+        """
+        from .watch import Watcher, WatchSet
+
+        self._reset()
+        with Watcher.create() as watcher:
+            try:
+                while True:
+                    self._build(config, watching=True)
+                    watched = WatchSet(p for paths in self._inputs.values() for p in paths)
+                    watcher.watch(watched)
+                    log.info(fg.blue(f"Watching {len(watched)} inputs for changes..."))
+                    self._invalidate(watcher.wait())
+            except KeyboardInterrupt:
+                log.info("")
+            finally:
+                self._reset()
+
+    def _invalidate(self, changed: Set[Path]):
+        from .watch import WatchSet
+
+        stale = []
+        for name, paths in self._inputs.items():
+            watched = WatchSet(paths)
+            if any(watched.matches(p) for p in changed):
+                stale.append(name)
+
+        dependents: Dict[str, Set[str]] = defaultdict(set)
+        for name in self._cache:
+            for dep in self._injector.get_dependencies(name):
+                dependents[dep].add(name)
+
+        invalid: Set[str] = set()
+        while stale:
+            name = stale.pop()
+            if name not in invalid:
+                invalid.add(name)
+                stale.extend(dependents[name])
+
+        for name in invalid:
+            self._cache.pop(name, None)
+            self._inputs.pop(name, None)
+        log.info(fg.blue("Changed: ") + ", ".join(sorted(str(p) for p in changed)))
 
     def _resolve_build(self, config: Config):
         Recipe.cleaning = config.cleaning or config.clean_all
-
-        self._injector.add_async_injection_interceptor(self._intercept_coroutines)
-        self._injector.check_for_cycles()
+        self.stats = Recipe.stats = StatCache()
+        Recipe.database = self._load_database(config)
+        Recipe.digests = (Recipe.database.digests if Recipe.database
+                          else FileDigests(stats=self.stats))
+        Recipe.planned = set()
+        Recipe.cleaner = Cleaner()
+        if (config.cas_dir or config.remote_cache) and not (Recipe.cleaning or config.dry_run):
+            Recipe.artifacts = self._open_artifacts(config)
+        Recipe.jobs = JobSlots(config.jobs, config.load_average, self._pools, Recipe.profiler,
+                               fail_fast=config.fail_fast, keep_going=config.keep_going)
+        if config.spool_output:
+            ShellRecipe.default_sink = SpoolOutputSink
+
+        self._check_for_cycles()
 
         keepers = self._get_keepers()
 
@@ -212,21 +392,109 @@ class BuildEngine:
         if config.clean_all:
             resources = self._get_targets()
         elif not Recipe.cleaning:
-            resources = [*self._injector.get_ordered_dependencies(config.target), config.target]
+            resources = [*self._get_ordered_dependencies(config.target), config.target]
         else:
             resources = [config.target]
 
         if Recipe.cleaning:
             resources = [t for t in resources if t not in keepers]
 
-        loop = asyncio.get_event_loop()
-        result_map = {
-            resource: loop.run_until_complete(self._resolve_resource(resource, targeted=True))
-            for resource in resources
-        }
-        loop.run_until_complete(self._cleanup_temps())
+        return asyncio.run(self._schedule(resources))
+
+    async def _schedule(self, resources):
+        """
+        Resolve the given resources as a dependency graph.  Each resource
+        is started as soon as all of its dependencies within the graph are
+        resolved, so independent branches of the build run concurrently.
+
+        Like make, no new jobs are started after a failure and the running
+        ones are left to finish.  With `--keep-going`, everything that
+        doesn't depend on the failure is still built.  With `--fail-fast`,
+        the pending resources are cancelled and the running commands are
+        terminated as well.
+        """
+        wanted = set(resources)
+        tasks: Dict[str, asyncio.Future] = {}
+
+        def cancel_all():
+            for task in tasks.values():
+                task.cancel()
+
+        if Recipe.config.fail_fast:
+            Recipe.jobs.on_halt(cancel_all)
+
+        def launch(name):
+            if name not in tasks:
+                deps = [launch(dep) for dep in self._injector.get_dependencies(name)
+                        if dep in wanted]
+                tasks[name] = asyncio.ensure_future(self._resolve_node(name, deps))
+            return tasks[name]
+
+        results = await asyncio.gather(*(launch(r) for r in resources),
+                                       return_exceptions=True)
+        if Recipe.artifacts is not None:
+            await Recipe.artifacts.flush()
+            if Recipe.artifacts.stores:
+                await Recipe.artifacts.evict()
+        # Only failures that reached a resource, not those its code caught.
+        errors = self._collect_errors(results)
+        if not errors and any(isinstance(r, asyncio.CancelledError) for r in results):
+            errors = [BuildError("The build was cancelled.")]
+        if len(errors) == 1:
+            raise errors[0]
+        if errors:
+            raise AggregateError(errors)
 
-        return result_map
+        if Recipe.cleaning:
+            await self._delete_queued()
+        elif not Recipe.config.dry_run:
+            await self._cleanup_temps()
+        return dict(zip(resources, results))
+
+    def _collect_errors(self, results) -> List[Exception]:
+        """
+        Flatten the distinct errors among the given results, leaving out
+        jobs that were never started because of another failure.
+        """
+        errors: Dict[int, Exception] = {}
+        for result in results:
+            if isinstance(result, AggregateError):
+                errors.update((id(e), e) for e in self._collect_errors(result.errors))
+            elif isinstance(result, Exception) and not isinstance(result, BuildHalted):
+                errors[id(result)] = result
+        return list(errors.values())
+
+    async def _resolve_node(self, name, deps):
+        await asyncio.gather(*deps)
+        return await self._resolve_resource(name, targeted=True)
+
+    def _open_artifacts(self, config: Config) -> "ArtifactCache":
+        from .cas import ArtifactCache
+        from .config import DEFAULT_CAS_DIR
+
+        remote = None
+        if config.remote_cache:
+            from .remote import HttpCacheBackend
+            remote = HttpCacheBackend(config.remote_cache)
+        return ArtifactCache(config.cas_dir or DEFAULT_CAS_DIR, config.cas_size << 20, remote)
+
+    def _close_artifacts(self, artifacts: "ArtifactCache"):
+        stats = artifacts.stats()
+        summary = f"{stats['hits']} hits, {stats['misses']} misses, {stats['stores']} stored"
+        if artifacts.remote is not None:
+            summary += f", {stats['remote_hits']} remote hits, {stats['uploads']} uploaded"
+        log.info(fg.blue("Artifact cache: ") + summary)
+
+    def _write_profile(self, config: Config, profiler: "Profiler"):
+        from .profile import RESOURCE
+
+        dependencies = {
+            name: list(self._injector.get_dependencies(name))
+            for name in {s.name for s in profiler.slices if s.cat == RESOURCE}
+        }
+        profiler.summarize(log, dependencies)
+        profiler.write(config.profile)
+        log.info("Wrote profile: %s", config.profile)
 
     def _get_targets(self):
         """Get all resources tagged as 'targets'."""
@@ -254,16 +522,24 @@ class BuildEngine:
             if name in self._cache and not Recipe.cleaning:
                 return self._cache[name]
 
-            provided_value = (
-                await self._injector.require_async(name)
-                if value is xeno.NOTHING
-                else value
-            )
-
+            inputs: Set[Union[Path, FileSet]] = set()
+            token = resource_inputs.set(inputs)
             try:
+                provided_value = (
+                    await self._injector.require_async(name)
+                    if value is xeno.NOTHING
+                    else value
+                )
+
                 if not Recipe.cleaning or targeted:
                     log.info(fg.blue('[..]') + ' ' + fg.yellow(name))
-                final_value = self._cache[name] = await self._deep_resolve(provided_value, targeted)
+                if Recipe.profiler is None:
+                    final_value = await self._deep_resolve(provided_value, targeted)
+                else:
+                    from .profile import RESOURCE
+                    with Recipe.profiler.span(name, RESOURCE):
+                        final_value = await self._deep_resolve(provided_value, targeted)
+                self._cache[name] = final_value
                 if not Recipe.cleaning:
                     log.info(fg.green('[ok]') + ' ' + fg.yellow(name))
 
@@ -271,13 +547,31 @@ class BuildEngine:
 
             except Exception as e:
                 log.info(fg.white(bg.red('[!!]')) + ' ' + fg.yellow(name))
+                Recipe.jobs.job_failed(e)
                 raise e
 
+            finally:
+                resource_inputs.reset(token)
+                self._inputs[name] = inputs
+
     async def _deep_resolve(self, value, targeted=False):
         if isinstance(value, Recipe):
-            return await self._deep_resolve(await value.make(targeted))
+            try:
+                made = await value.make(targeted)
+            except Exception as e:
+                # Nothing can catch this failure anymore, so halt now rather
+                # than once the rest of the resource is done.
+                Recipe.jobs.job_failed(e)
+                raise
+            return await self._deep_resolve(made)
+        if isinstance(value, FileSet):
+            # Plain paths, which downstream recipes may still be scanning.
+            inputs = resource_inputs.get()
+            if inputs is not None:
+                inputs.add(value)
+            return value
         if inspect.isgenerator(value):
-            return await self._deep_resolve(list(value), targeted=targeted)
+            return await self._resolve_stream(value, targeted)
         if asyncio.iscoroutine(value):
             return await self._deep_resolve(await value)
         if isinstance(value, Sequential):
@@ -290,17 +584,54 @@ class BuildEngine:
             )
         return value
 
+    async def _resolve_stream(self, values, targeted=False):
+        """
+        Resolve the items of a generator as it produces them, so that e.g.
+        the first compile jobs for a `FileSet` start before the rest of the
+        source tree has been scanned.
+        """
+        tasks = []
+        try:
+            for value in values:
+                tasks.append(asyncio.ensure_future(self._deep_resolve(value, targeted=targeted)))
+                # Let the new task start its job before producing the next.
+                await asyncio.sleep(0)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return AggregateError.aggregate(*await asyncio.gather(*tasks, return_exceptions=True))
+
     async def _intercept_coroutines(self, attrs, param_map, alias_map):
-        return {
-            k: await self._resolve_resource(k, value=xeno.NOTHING, alias=alias_map[k])
-            for k, v in param_map.items()
-        }
+        names = list(param_map)
+        values = await asyncio.gather(
+            *(self._resolve_resource(k, value=xeno.NOTHING, alias=alias_map[k]) for k in names)
+        )
+        return dict(zip(names, values))
 
     async def _cleanup_temps(self):
-        result = AggregateError.aggregate(await asyncio.gather(
-            *[x.clean() for x in self._temps], return_exceptions=True
-        ))
-        return result
+        # Queue them all, then delete them in one batch.
+        for temp in self._temps:
+            await temp._clean()
+        await self._delete_queued()
+
+    async def _delete_queued(self):
+        """Delete everything recipes queued for deletion while cleaning."""
+        cleaner = Recipe.cleaner
+        if Recipe.config.dry_run:
+            for path in cleaner.paths():
+                if os.path.lexists(path):
+                    log.info(fg.yellow('[dry]') + fg.magenta(' delete ') + path)
+            cleaner.clear()
+            return
+        if not len(cleaner):
+            return
+
+        result = await cleaner.run()
+        self.stats.clear()
+        log.info(fg.green('[ok]') + fg.magenta(' deleted ') + result.summary())
+        if result.errors:
+            raise AggregateError(list(result.errors))
 
 
 # -------------------------------------------------------------------
@@ -310,4 +641,6 @@ target = build.target
 provide = build.provide
 keep = build.keep
 noclean = build.noclean
+pool = build.pool
+cpu = build.cpu
 seq = Sequential
@@ -0,0 +1,385 @@
+# --------------------------------------------------------------------
+# cas.py: Content-addressed artifact cache for file recipe outputs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import asyncio
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Union
+
+from .config import DEFAULT_CAS_DIR, DEFAULT_CAS_SIZE_MB
+from .util import get_logger, relative_path
+
+if TYPE_CHECKING:
+    from .remote import CacheBackend
+
+# --------------------------------------------------------------------
+MANIFEST = "manifest.json"
+DEPFILE = "depfile"
+MAX_VARIANTS = 16
+FICLONE = 0x40049409
+PathLike = Union[str, Path]
+Deps = Dict[str, Optional[str]]
+DigestFunction = Callable[[str], Optional[str]]
+
+# --------------------------------------------------------------------
+log = get_logger("panifex")
+
+
+# --------------------------------------------------------------------
+def link_or_copy(src: PathLike, dst: PathLike):
+    """
+    Materialize `src` at `dst` as cheaply as possible: a reflink where the
+    filesystem supports it, otherwise a hardlink, otherwise a copy.
+    """
+    try:
+        with open(src, "rb") as infile, open(dst, "wb") as outfile:
+            fcntl.ioctl(outfile.fileno(), FICLONE, infile.fileno())
+        shutil.copystat(src, dst)
+        return
+    except OSError:
+        try:
+            os.unlink(dst)
+        except FileNotFoundError:
+            pass
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+# --------------------------------------------------------------------
+class ArtifactCache:
+    """
+    A local content-addressed store of recipe outputs.  Entries are keyed
+    by a digest of everything that determines the outputs, i.e. a file
+    recipe's signature, and are evicted least recently used first when
+    the cache grows beyond `max_size` bytes.
+
+    Recipes with a depfile don't know their dependencies until they've
+    run, so like ccache's manifests, their key only leads to a list of
+    variants: the dependencies each earlier run found, with their digests.
+    The first variant whose dependencies are all unchanged is restored,
+    along with the depfile it was stored with.
+
+    With a `remote` backend, local misses are looked up remotely and new
+    entries are uploaded in the background.  Transfers run in worker
+    threads outside of the job slots; call `flush()` before the event
+    loop closes to wait for pending uploads.
+    """
+
+    def __init__(self, root: PathLike = DEFAULT_CAS_DIR,
+                 max_size: int = DEFAULT_CAS_SIZE_MB << 20,
+                 remote: Optional["CacheBackend"] = None):
+        self.root = Path(root)
+        self.max_size = max_size
+        self.remote = remote
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.remote_hits = 0
+        self.uploads = 0
+        self._uploads: Set[asyncio.Future] = set()
+        self._remote_warned = False
+
+    @staticmethod
+    def key(signature: Dict[str, Any]) -> str:
+        data = json.dumps(signature, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _variant_key(self, key: str, deps: Deps) -> str:
+        return self.key({"key": key, "deps": deps})
+
+    async def fetch(self, key: str, outputs: List[Path], depfile: Optional[Path] = None,
+                    digest: Optional[DigestFunction] = None) -> Optional[Dict[str, Any]]:
+        """
+        Restore the outputs, and the depfile if given, returning the entry's
+        manifest, or None on a miss.  With a depfile, `digest` gives the
+        current digest of each of the variants' dependencies.  Local misses
+        are looked up in the remote cache, if there is one.
+        """
+        manifest = self._restore(key, outputs, depfile, digest)
+        if manifest is not None:
+            self.hits += 1
+            return manifest
+        if self.remote is not None:
+            manifest = await self._fetch_remote(key, outputs, depfile, digest)
+            if manifest is not None:
+                self.remote_hits += 1
+                return manifest
+        self.misses += 1
+        return None
+
+    async def _fetch_remote(self, key: str, outputs: List[Path], depfile: Optional[Path],
+                            digest: Optional[DigestFunction]) -> Optional[Dict[str, Any]]:
+        if depfile is None:
+            if await self._download(key):
+                return self._restore_entry(key, outputs)
+            return None
+
+        tmp = await self._get(key)
+        if tmp is None:
+            return None
+        try:
+            variants = self._read_manifest(tmp).get("variants", [])
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._add_variants(key, variants)
+        deps = self._match_variant(variants, digest)
+        if deps is None:
+            return None
+        variant_key = self._variant_key(key, deps)
+        if not (self._entry(variant_key) / MANIFEST).exists():
+            if not await self._download(variant_key):
+                return None
+        return self._restore_entry(variant_key, outputs, depfile)
+
+    async def _get(self, key: str) -> Optional[Path]:
+        """Unpack the remote entry into a temporary directory."""
+        from .remote import unpack
+
+        assert self.remote is not None
+        try:
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(None, self.remote.get, key)
+        except Exception as e:
+            self._remote_warning(f"Failed to fetch artifacts from remote cache: {e}")
+            return None
+        if data is None:
+            return None
+
+        entry = self._entry(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+        try:
+            unpack(data, tmp)
+        except (OSError, ValueError) as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            log.warning(f"Failed to unpack artifacts from remote cache: {e}")
+            return None
+        return tmp
+
+    async def _download(self, key: str) -> bool:
+        tmp = await self._get(key)
+        if tmp is None:
+            return False
+        entry = self._entry(key)
+        try:
+            os.rename(tmp, entry)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not (entry / MANIFEST).exists():
+                log.warning(f"Failed to unpack artifacts from remote cache: {e}")
+                return False
+        return True
+
+    @staticmethod
+    def _read_manifest(entry: Path) -> Dict[str, Any]:
+        try:
+            with open(entry / MANIFEST, "r") as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _match_variant(variants: List[Deps], digest: Optional[DigestFunction]) -> Optional[Deps]:
+        assert digest is not None
+        for deps in variants:
+            if all(digest(path) == value for path, value in deps.items()):
+                return deps
+        return None
+
+    def _add_variants(self, key: str, variants: List[Deps]):
+        """Merge the given variants into the key's list, newest first."""
+        entry = self._entry(key)
+        merged = list(variants)
+        for deps in self._read_manifest(entry).get("variants", []):
+            if deps not in merged:
+                merged.append(deps)
+        try:
+            entry.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=entry)
+            with os.fdopen(fd, "w") as outfile:
+                json.dump({"variants": merged[:MAX_VARIANTS]}, outfile)
+            os.replace(tmp, entry / MANIFEST)
+        except OSError as e:
+            log.warning("Failed to store artifacts in cache: %s", e)
+
+    def _restore(self, key: str, outputs: List[Path], depfile: Optional[Path],
+                 digest: Optional[DigestFunction]) -> Optional[Dict[str, Any]]:
+        if depfile is None:
+            return self._restore_entry(key, outputs)
+        entry = self._entry(key)
+        deps = self._match_variant(self._read_manifest(entry).get("variants", []), digest)
+        if deps is None:
+            return None
+        manifest = self._restore_entry(self._variant_key(key, deps), outputs, depfile)
+        if manifest is not None:
+            os.utime(entry / MANIFEST)
+        return manifest
+
+    def _restore_entry(self, key: str, outputs: List[Path],
+                       depfile: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        entry = self._entry(key)
+        manifest = self._read_manifest(entry)
+        if manifest.get("outputs") != [relative_path(p) for p in outputs]:
+            return None
+        if depfile is not None and manifest.get("depfile") != relative_path(depfile):
+            return None
+
+        for n, output in enumerate(outputs):
+            output.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                output.unlink()
+            except FileNotFoundError:
+                pass
+            link_or_copy(entry / str(n), output)
+            # Restored outputs must be newer than the inputs that made the
+            # recipe run, not as old as the cache entry.  A hardlink shares
+            # the entry's mtime, which doesn't matter to the cache.
+            os.utime(output)
+        if depfile is not None:
+            depfile.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                depfile.unlink()
+            except FileNotFoundError:
+                pass
+            link_or_copy(entry / DEPFILE, depfile)
+
+        os.utime(entry / MANIFEST)
+        return manifest
+
+    def store(self, key: str, outputs: List[Path], depfile: Optional[Path] = None,
+              deps: Optional[Deps] = None) -> bool:
+        """
+        Store the outputs, unless some of them aren't regular files.  With a
+        depfile, store them as a variant for the given dependencies and
+        their digests.
+        """
+        if not all(p.is_file() for p in outputs):
+            return False
+        if depfile is not None:
+            if deps is None or not depfile.is_file():
+                return False
+            base_key, key = key, self._variant_key(key, deps)
+            self._add_variants(base_key, [deps])
+            if self.remote is not None:
+                self._upload(base_key)
+        entry = self._entry(key)
+        if (entry / MANIFEST).exists():
+            return True
+
+        manifest: Dict[str, Any] = {"outputs": [relative_path(p) for p in outputs]}
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=entry.parent))
+        try:
+            for n, output in enumerate(outputs):
+                shutil.copy2(output, tmp / str(n))
+            if depfile is not None:
+                shutil.copy2(depfile, tmp / DEPFILE)
+                manifest.update(depfile=relative_path(depfile), deps=deps)
+            with open(tmp / MANIFEST, "w") as outfile:
+                json.dump(manifest, outfile)
+            os.rename(tmp, entry)
+        except OSError as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                log.warning("Failed to store artifacts in cache: %s", e)
+                return False
+        self.stores += 1
+        if self.remote is not None:
+            self._upload(key)
+        return True
+
+    def _upload(self, key: str):
+        from .remote import pack
+
+        assert self.remote is not None
+        remote = self.remote
+        entry = self._entry(key)
+
+        def upload():
+            remote.put(key, pack(entry))
+
+        future = asyncio.get_running_loop().run_in_executor(None, upload)
+        self._uploads.add(future)
+        future.add_done_callback(self._upload_done)
+
+    def _upload_done(self, future: asyncio.Future):
+        self._uploads.discard(future)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._remote_warning(
+                f"Failed to upload artifacts to remote cache: {future.exception()}")
+        else:
+            self.uploads += 1
+
+    def _remote_warning(self, message: str):
+        if self._remote_warned:
+            log.debug(message)
+        else:
+            log.warning(message)
+            self._remote_warned = True
+
+    async def flush(self):
+        """Wait for all pending uploads to finish."""
+        while self._uploads:
+            await asyncio.wait(list(self._uploads))
+
+    async def evict(self):
+        """
+        Remove least recently used entries until the cache fits.  Scanning
+        the cache blocks on the filesystem, so it runs on a worker thread.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._evict)
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for manifest in self.root.glob("*/*/" + MANIFEST):
+            entry = manifest.parent
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((manifest.stat().st_mtime, size, entry))
+            total += size
+
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"hits": self.hits, "misses": self.misses, "stores": self.stores}
+        if self.remote is not None:
+            stats.update(remote_hits=self.remote_hits, uploads=self.uploads)
+        return stats
+
+
+# --------------------------------------------------------------------
+def unshare(path: Path):
+    """
+    Unlink the given file if it is hardlinked elsewhere, e.g. into the
+    artifact cache, so that commands overwriting it in place can't
+    corrupt the other copy.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return
+    if stat.S_ISREG(st.st_mode) and st.st_nlink > 1:
+        os.unlink(path)
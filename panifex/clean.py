@@ -0,0 +1,122 @@
+# --------------------------------------------------------------------
+# clean.py: Batched, parallel deletion of recipe outputs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import asyncio
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Union
+
+from .config import CPU_CORES
+
+# --------------------------------------------------------------------
+PathLike = Union[str, Path]
+CLEAN_WORKERS = min(32, CPU_CORES + 4)
+CLEAN_BATCH_SIZE = 256
+
+
+# --------------------------------------------------------------------
+@dataclass
+class CleanResult:
+    files: int = 0
+    dirs: int = 0
+    elapsed: float = 0.0
+    errors: List[OSError] = field(default_factory=list)
+
+    def merge(self, other: "CleanResult"):
+        self.files += other.files
+        self.dirs += other.dirs
+        self.errors.extend(other.errors)
+
+    def summary(self) -> str:
+        return f"{self.files} file(s) and {self.dirs} directory(s) in {self.elapsed:.2f}s"
+
+
+# --------------------------------------------------------------------
+def _delete_batch(paths: List[str]) -> CleanResult:
+    result = CleanResult()
+    for path in paths:
+        try:
+            os.unlink(path)
+            result.files += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Linux fails with EISDIR for directories, other systems EPERM.
+            if not os.path.isdir(path) or os.path.islink(path):
+                result.errors.append(e)
+                continue
+            try:
+                shutil.rmtree(path)
+                result.dirs += 1
+            except OSError as e:
+                result.errors.append(e)
+    return result
+
+
+# --------------------------------------------------------------------
+class Cleaner:
+    """
+    Collects the paths recipes want deleted and deletes them all at once.
+    Paths are deduplicated and sorted, anything inside a directory that
+    is deleted anyway is skipped, and the rest is deleted by a thread
+    pool in batches of files sharing a directory, so the event loop never
+    blocks on the filesystem.
+    """
+
+    def __init__(self, workers: int = CLEAN_WORKERS, batch_size: int = CLEAN_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._paths: Set[str] = set()
+
+    def add(self, path: PathLike):
+        self._paths.add(os.path.abspath(path))
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def paths(self) -> List[str]:
+        """The sorted paths to delete, without those inside other paths."""
+        paths: List[str] = []
+        for path in sorted(self._paths, key=lambda p: p.split(os.sep)):
+            if paths and path.startswith(paths[-1].rstrip(os.sep) + os.sep):
+                continue
+            paths.append(path)
+        return paths
+
+    def _batches(self, paths: Iterable[str]) -> List[List[str]]:
+        by_parent: Dict[str, List[str]] = defaultdict(list)
+        for path in paths:
+            by_parent[os.path.dirname(path)].append(path)
+        return [
+            batch[n:n + self.batch_size]
+            for batch in by_parent.values()
+            for n in range(0, len(batch), self.batch_size)
+        ]
+
+    async def run(self) -> CleanResult:
+        """Delete the collected paths, then forget them."""
+        started = time.perf_counter()
+        result = CleanResult()
+        batches = self._batches(self.paths())
+        self._paths.clear()
+        if batches:
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(min(self.workers, len(batches))) as executor:
+                for batch_result in await asyncio.gather(
+                        *(loop.run_in_executor(executor, _delete_batch, b) for b in batches)):
+                    result.merge(batch_result)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def clear(self):
+        self._paths.clear()
@@ -9,11 +9,20 @@
 import argparse
 import os
 import multiprocessing
+from pathlib import Path
 
 
 # --------------------------------------------------------------------
 CPU_CORES = multiprocessing.cpu_count()
 DEBUG = "PANIFEX_DEBUG" in os.environ
+DEFAULT_DB_PATH = ".panifex/db"
+DEFAULT_PROFILE_PATH = "panifex-profile.json"
+DEFAULT_CAS_DIR = str(
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "panifex" / "cas")
+DEFAULT_CAS_SIZE_MB = 5120
+DEFAULT_DAEMON_SOCKET = ".panifex/daemon.sock"
+DEFAULT_RSPFILE_DIR = ".panifex/rsp"
+DEFAULT_RSPFILE_SIZE = 1 << 16
 FILENAME_DATE_FORMAT = "%Y-%m-%d"
 FILENAME_TIME_FORMAT = "%H%M_%S"
 FILENAME_DATETIME_FORMAT = f'{FILENAME_DATE_FORMAT}_{FILENAME_TIME_FORMAT}'
@@ -31,6 +40,22 @@ class Config:
         self.verbose = False
         self.list_targets = False
         self.log_to_file = ""
+        self.db_path = DEFAULT_DB_PATH
+        self.use_db = True
+        self.jobs = CPU_CORES
+        self.load_average = None
+        self.profile = None
+        self.spool_output = False
+        self.watch = False
+        self.cas_dir = None
+        self.cas_size = DEFAULT_CAS_SIZE_MB
+        self.remote_cache = None
+        self.dry_run = False
+        self.explain = False
+        self.fail_fast = False
+        self.keep_going = False
+        self.report = None
+        self.rspfile_size = DEFAULT_RSPFILE_SIZE
 
     @classmethod
     def get_parser(cls, desc):
@@ -41,9 +66,28 @@ class Config:
         parser.add_argument('-v', "--verbose", action="store_true")
         parser.add_argument('-l', "--list", dest="list_targets", action="store_true")
         parser.add_argument('-F', "--log-to-file", dest="log_to_file")
+        parser.add_argument("--db", dest="db_path", default=DEFAULT_DB_PATH)
+        parser.add_argument("--no-db", dest="use_db", action="store_false")
+        parser.add_argument("-j", "--jobs", type=int, default=CPU_CORES)
+        parser.add_argument("-L", "--load-average", dest="load_average", type=float)
+        parser.add_argument("--profile", nargs="?", const=DEFAULT_PROFILE_PATH)
+        parser.add_argument("--spool-output", dest="spool_output", action="store_true")
+        parser.add_argument("-w", "--watch", action="store_true")
+        parser.add_argument("--cas", dest="cas_dir", nargs="?", const=DEFAULT_CAS_DIR)
+        parser.add_argument("--cas-size", dest="cas_size", type=int, metavar="MB",
+                            default=DEFAULT_CAS_SIZE_MB)
+        parser.add_argument("--remote-cache", dest="remote_cache", metavar="URL")
+        parser.add_argument("-n", "--dry-run", dest="dry_run", action="store_true")
+        parser.add_argument("--explain", action="store_true")
+        parser.add_argument("--report", metavar="FILE")
+        parser.add_argument("--rspfile-size", dest="rspfile_size", type=int, metavar="BYTES",
+                            default=DEFAULT_RSPFILE_SIZE)
+        failure = parser.add_mutually_exclusive_group()
+        failure.add_argument("--fail-fast", dest="fail_fast", action="store_true")
+        failure.add_argument("-k", "--keep-going", dest="keep_going", action="store_true")
         return parser
 
-    def parse_args(self, desc):
+    def parse_args(self, desc, args=None):
         parser = self.get_parser(desc)
-        parser.parse_known_args(namespace=self)
+        parser.parse_known_args(args, namespace=self)
         return self
@@ -0,0 +1,215 @@
+# --------------------------------------------------------------------
+# daemon.py: A resident build server and its thin client.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import io
+import json
+import os
+import runpy
+import signal
+import socket
+import socketserver
+import sys
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import ansilog
+
+from .config import DEFAULT_DAEMON_SOCKET
+from .util import get_logger
+
+# --------------------------------------------------------------------
+STDOUT = 1
+STDERR = 2
+# Set by the shell, the terminal or the login session, so they differ
+# between clients of the same build.  Builds run from the script's
+# directory whatever the client's PWD is.
+VOLATILE_ENV = frozenset((
+    "_", "PWD", "OLDPWD", "SHLVL", "TERM", "COLORTERM", "COLUMNS", "LINES", "WINDOWID",
+    "DISPLAY", "GPG_TTY", "STY", "TMUX", "TMUX_PANE", "VTE_VERSION", "XDG_SESSION_ID",
+    "XDG_VTNR",
+))
+VOLATILE_ENV_PREFIXES = ("SSH_", "TERM_", "KONSOLE_", "ITERM_", "WT_")
+
+# --------------------------------------------------------------------
+log = get_logger("panifex")
+
+
+# --------------------------------------------------------------------
+def socket_path(script: Path) -> Path:
+    return script.parent / DEFAULT_DAEMON_SOCKET
+
+
+# --------------------------------------------------------------------
+def _is_volatile(name: str) -> bool:
+    return name in VOLATILE_ENV or name.startswith(VOLATILE_ENV_PREFIXES)
+
+
+# --------------------------------------------------------------------
+def _stable_env(env: Dict[str, str]) -> Dict[str, str]:
+    return {k: v for k, v in env.items() if not _is_volatile(k)}
+
+
+# --------------------------------------------------------------------
+def _send(wfile, message: Dict[str, Any]):
+    wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+    wfile.flush()
+
+
+# --------------------------------------------------------------------
+class ClientStream(io.TextIOBase):
+    """A text stream forwarding everything written to it to a client."""
+
+    def __init__(self, wfile, fd: int, tty: bool):
+        super().__init__()
+        self._wfile = wfile
+        self._fd = fd
+        self._tty = tty
+
+    def write(self, s: str) -> int:
+        if s:
+            _send(self._wfile, {"fd": self._fd, "data": s})
+        return len(s)
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+# --------------------------------------------------------------------
+class BuildServer(socketserver.UnixStreamServer):
+    """
+    Keeps a build script loaded in a resident BuildEngine and runs builds
+    for clients connecting to a Unix domain socket next to the script.
+    The script is only re-executed when it has changed, so the injector,
+    its cycle check, the dependency order and the build database all
+    stay in memory between builds.
+
+    Builds run with the environment the server was started in, which
+    the script and its `sh` factory have already captured.  Clients
+    whose environment differs are refused and build on their own.
+    """
+
+    def __init__(self, script: Path, engine=None):
+        if engine is None:
+            from .build import build as engine
+        self.script = script
+        self.engine = engine
+        self.engine.resident = True
+        self._script_mtime: Optional[int] = None
+        self.environ = _stable_env(dict(os.environ))
+        path = socket_path(script)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            path.unlink()
+        super().__init__(str(path), BuildRequestHandler)
+
+    def load_script(self):
+        mtime = self.script.stat().st_mtime_ns
+        if mtime == self._script_mtime:
+            return
+        log.info("Loading build script: %s", self.script)
+        self.engine._initialize()
+        self.engine._defer_calls = True
+        try:
+            runpy.run_path(str(self.script), run_name="__main__")
+        finally:
+            self.engine._defer_calls = False
+        self._script_mtime = mtime
+
+    def run_build(self, args: List[str], stdout: ClientStream, stderr: ClientStream) -> int:
+        handler = ansilog.handler
+        old_stream = handler.setStream(stderr)
+        handler.formatter.stream = stderr  # type: ignore
+        try:
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                try:
+                    # Undo any os.chdir() by the last build's script.
+                    os.chdir(self.script.parent)
+                    self.load_script()
+                    self.engine(args)
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        return e.code or 0
+                    return 1
+                except Exception as e:
+                    log.error(f"{type(e).__name__}: {e}")
+                    self._script_mtime = None
+                    return 1
+            return 0
+        finally:
+            handler.setStream(old_stream)
+            handler.formatter.stream = old_stream  # type: ignore
+
+    def serve(self):
+        log.info("Serving builds on %s", self.server_address)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+            Path(self.server_address).unlink(missing_ok=True)  # type: ignore
+
+
+# --------------------------------------------------------------------
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    server: BuildServer
+
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        env = request.get("env")
+        env = None if env is None else _stable_env(env)
+        if env is not None and env != self.server.environ:
+            changed = sorted(k for k in set(env) | set(self.server.environ)
+                             if env.get(k) != self.server.environ.get(k))
+            _send(self.wfile, {"refused": "environment differs: " + ", ".join(changed)})
+            return
+        stdout = ClientStream(self.wfile, STDOUT, request.get("stdout_tty", False))
+        stderr = ClientStream(self.wfile, STDERR, request.get("stderr_tty", False))
+        try:
+            code = self.server.run_build(request["args"], stdout, stderr)
+            _send(self.wfile, {"exit": code})
+        except BrokenPipeError:
+            pass
+
+
+# --------------------------------------------------------------------
+def request_build(script: Path, args: List[str]) -> Optional[int]:
+    """
+    Ask a running build server for the given script to run a build,
+    echoing its output.  Returns the build's exit code, or None if no
+    server is running or it refused the build.
+    """
+    path = socket_path(script)
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+
+    streams = {STDOUT: sys.stdout, STDERR: sys.stderr}
+    with sock, sock.makefile("rwb") as conn:
+        _send(conn, {"args": args,
+                     "env": dict(os.environ),
+                     "stdout_tty": sys.stdout.isatty(),
+                     "stderr_tty": sys.stderr.isatty()})
+        for line in conn:
+            message = json.loads(line)
+            if "refused" in message:
+                sys.stderr.write(f"bake: Not using the build server, {message['refused']}.\n")
+                return None
+            if "exit" in message:
+                return message["exit"]
+            stream = streams[message["fd"]]
+            stream.write(message["data"])
+            stream.flush()
+    return 1
@@ -0,0 +1,175 @@
+# --------------------------------------------------------------------
+# db.py: Persistent content-hash build database.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .stats import StatCache
+from .util import get_logger
+
+# --------------------------------------------------------------------
+DIGEST_BLOCK_SIZE = 1 << 20
+PathLike = Union[str, Path]
+
+# --------------------------------------------------------------------
+log = get_logger("panifex")
+
+
+# --------------------------------------------------------------------
+class FileDigests:
+    """
+    Content digests of files, cached on (inode, size, mtime_ns) so that
+    files which haven't changed since they were last hashed are never
+    read again.  A directory's digest covers the names and digests of
+    everything in it.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, List[Any]]] = None,
+                 stats: Optional[StatCache] = None):
+        self.stats = stats or StatCache()
+        self._entries: Dict[str, Tuple[int, int, int, str]] = {
+            k: tuple(v) for k, v in (entries or {}).items()  # type: ignore
+        }
+        # Whether entries were added, replaced or removed since loading.
+        self.dirty = False
+
+    def digest(self, path: PathLike) -> Optional[str]:
+        key = str(path)
+        st = self.stats.stat(key)
+        if st is None:
+            if self._entries.pop(key, None) is not None:
+                self.dirty = True
+            return None
+
+        if stat.S_ISDIR(st.st_mode):
+            # Not cached, a directory's mtime doesn't change with the
+            # contents of its files.
+            return self._hash_directory(key)
+
+        fingerprint = (st.st_ino, st.st_size, st.st_mtime_ns)
+        cached = self._entries.get(key)
+        if cached is not None and cached[:3] == fingerprint:
+            return cached[3]
+
+        digest = self._hash_file(key)
+        self._entries[key] = (*fingerprint, digest)
+        self.dirty = True
+        return digest
+
+    def digest_all(self, paths: Iterable[PathLike]) -> Dict[str, Optional[str]]:
+        return {str(p): self.digest(p) for p in paths}
+
+    def entries(self) -> Dict[str, List[Any]]:
+        return {k: list(v) for k, v in self._entries.items()}
+
+    def _hash_directory(self, path: str) -> str:
+        sha = hashlib.sha256(b"dir\0")
+        try:
+            with os.scandir(path) as scan:
+                entries = sorted(scan, key=lambda e: e.name)
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.is_symlink():
+                # Not followed, links to directories may loop.
+                digest = "link:" + os.readlink(entry.path)
+            else:
+                digest = self.digest(entry.path) or ""
+            sha.update(f"{entry.name}\0{digest}\0".encode("utf-8", "surrogateescape"))
+        return sha.hexdigest()
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as infile:
+            for block in iter(lambda: infile.read(DIGEST_BLOCK_SIZE), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+
+# --------------------------------------------------------------------
+class BuildDatabase:
+    """
+    An on-disk record of what each file recipe last produced.  For every
+    set of outputs, the database remembers the input digests, the command
+    and environment used to make them, and the digests of the outputs
+    themselves.  A recipe whose record still matches is up to date no
+    matter what the timestamps say.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: PathLike, stats: Optional[StatCache] = None):
+        self.path = Path(path)
+        self.digests = FileDigests(stats=stats)
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: PathLike, stats: Optional[StatCache] = None) -> "BuildDatabase":
+        db = cls(path, stats)
+        try:
+            with open(db.path, "r") as infile:
+                data = json.load(infile)
+            if data.get("version") == cls.VERSION:
+                db.digests = FileDigests(data.get("digests"), stats)
+                db._records = data.get("records", {})
+            else:
+                log.warning("Ignoring build database with unknown version: %s", db.path)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable build database %s: %s", db.path, e)
+        return db
+
+    def save(self):
+        if not (self._dirty or self.digests.dirty):
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temporary, so that concurrent builds sharing the
+        # database can't write into each other's file.
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.path.parent)
+        try:
+            with os.fdopen(fd, "w") as outfile:
+                json.dump(
+                    {
+                        "version": self.VERSION,
+                        "digests": self.digests.entries(),
+                        "records": self._records,
+                    },
+                    outfile,
+                )
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._dirty = False
+        self.digests.dirty = False
+
+    @staticmethod
+    def key(outputs: Iterable[PathLike]) -> str:
+        return "\n".join(sorted(str(p) for p in outputs))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._records.get(key)
+
+    def put(self, key: str, record: Dict[str, Any]):
+        self._records[key] = record
+        self._dirty = True
+
+    def forget(self, key: str):
+        if self._records.pop(key, None) is not None:
+            self._dirty = True
+
+    def digest_all(self, paths: Iterable[PathLike]) -> Dict[str, Optional[str]]:
+        return self.digests.digest_all(paths)
@@ -0,0 +1,90 @@
+# --------------------------------------------------------------------
+# depfile.py: Parser for Makefile-syntax dependency files.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+# --------------------------------------------------------------------
+PathLike = Union[str, Path]
+ESCAPABLE = " #"
+
+
+# --------------------------------------------------------------------
+def _split_rule(line: str) -> Tuple[List[str], bool]:
+    """
+    Split a rule line into words, returning the words after the rule's
+    colon and whether there was one.  Handles the escapes gcc and clang
+    emit: `\\ ` and `\\#` inside paths, and `$$` for a literal `$`.
+    """
+    words: List[str] = []
+    word: List[str] = []
+    colon = False
+    i = 0
+    while i < len(line):
+        c = line[i]
+        following = line[i + 1] if i + 1 < len(line) else ""
+        if c == "\\" and following and following in ESCAPABLE:
+            word.append(following)
+            i += 2
+            continue
+        if c == "$" and following == "$":
+            word.append("$")
+            i += 2
+            continue
+        if c.isspace() or (c == ":" and not colon and (not following or following.isspace())):
+            if word:
+                words.append("".join(word))
+                word = []
+            if c == ":":
+                colon = True
+                words = []
+        else:
+            word.append(c)
+        i += 1
+    if word:
+        words.append("".join(word))
+    return words, colon
+
+
+# --------------------------------------------------------------------
+def parse_depfile(text: str) -> List[str]:
+    """
+    Parse the prerequisites of all rules in a depfile, like those written
+    by `gcc -MD -MF`, in order and without duplicates.
+    """
+    text = text.replace("\\\r\n", " ").replace("\\\n", " ")
+    deps: List[str] = []
+    seen = set()
+    for line in text.splitlines():
+        words, colon = _split_rule(line)
+        if not colon:
+            continue
+        for word in words:
+            if word not in seen:
+                seen.add(word)
+                deps.append(word)
+    return deps
+
+
+# --------------------------------------------------------------------
+def read_depfile(path: PathLike, cwd: Optional[PathLike] = None) -> Optional[List[str]]:
+    """
+    Read the prerequisites from the given depfile, relative to `cwd` if
+    they aren't absolute.  Returns None if the depfile can't be read.
+    """
+    path = Path(path)
+    if cwd is not None:
+        path = Path(cwd) / path
+    try:
+        with open(path, "r") as infile:
+            deps = parse_depfile(infile.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+    if cwd is None:
+        return deps
+    return [str(Path(cwd) / dep) for dep in deps]
@@ -20,6 +20,12 @@ class SubprocessError(BuildError):
         super().__init__("Failed to execute command: %s" % cmd)
 
 
+# --------------------------------------------------------------------
+class BuildHalted(BuildError):
+    def __init__(self):
+        super().__init__("Not started because another job failed.")
+
+
 # --------------------------------------------------------------------
 class BuildFailure(Exception):
     def __init__(self, target_name: str = None):
@@ -0,0 +1,206 @@
+# --------------------------------------------------------------------
+# fileset.py: Lazily evaluated, cached file globs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import fnmatch
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# --------------------------------------------------------------------
+PathLike = Union[str, Path]
+MAGIC = "*?["
+
+# --------------------------------------------------------------------
+# Finished scans by root and pattern, with the mtimes of the directories
+# they listed.  A scan stays valid until one of those directories
+# changes, i.e. until a file is added, removed or renamed in one.
+_scans: Dict[Tuple[str, str], Tuple[Dict[str, Optional[int]], List[Path]]] = {}
+
+
+# --------------------------------------------------------------------
+def _mtime(directory: str) -> Optional[int]:
+    try:
+        return os.stat(directory or ".").st_mtime_ns
+    except OSError:
+        return None
+
+
+# --------------------------------------------------------------------
+def _listdir(directory: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(directory or ".") as entries:
+            return sorted(entries, key=lambda e: e.name)
+    except OSError:
+        return []
+
+
+# --------------------------------------------------------------------
+def _is_dir(entry: os.DirEntry, follow_symlinks=True) -> bool:
+    try:
+        return entry.is_dir(follow_symlinks=follow_symlinks)
+    except OSError:
+        return False
+
+
+# --------------------------------------------------------------------
+def _matches(name: str, part: str) -> bool:
+    # Like `glob`, wildcards don't match hidden files.
+    if name.startswith(".") and not part.startswith("."):
+        return False
+    return fnmatch.fnmatchcase(name, part)
+
+
+# --------------------------------------------------------------------
+def _split(pattern: str) -> List[str]:
+    return [p for p in pattern.split("/") if p not in ("", ".")]
+
+
+# --------------------------------------------------------------------
+def _match_parts(names: Sequence[str], parts: Sequence[str]) -> bool:
+    """Whether the path components `names` match the pattern `parts`."""
+    if not parts:
+        return not names
+    part, rest = parts[0], parts[1:]
+    if part == "**":
+        if _match_parts(names, rest or ["*"]):
+            return True
+        return (len(names) > 1 and not names[0].startswith(".")
+                and _match_parts(names[1:], parts))
+    if not names:
+        return False
+    if not any(c in part for c in MAGIC):
+        return names[0] == part and _match_parts(names[1:], rest)
+    return _matches(names[0], part) and _match_parts(names[1:], rest)
+
+
+# --------------------------------------------------------------------
+class FileSet:
+    """
+    The files matching a glob pattern like "src/**/*.c", relative to
+    `root`.  Unlike the generator from `Path.glob()`, a FileSet can be
+    iterated any number of times: directories are scanned the first time
+    the files are needed and only as far as they're needed, and every
+    iteration shares the files found so far.
+
+    Wildcards follow `glob.glob()`: they don't match hidden files, and
+    `**` matches any number of directories.  A trailing `**` matches
+    everything below a directory.  Directories are listed in sorted
+    order, so the files come out in the same order on every build.  A
+    finished scan is reused by later FileSets with the same pattern and
+    root, e.g. in `--watch` mode, until a directory it listed is
+    modified.
+
+    A FileSet may be iterated from several threads at once, e.g. while
+    recipes sharing it as `includes` check whether they're done.
+    """
+
+    __slots__ = ("pattern", "root", "_key", "_files", "_mtimes", "_scan", "_lock")
+
+    def __init__(self, pattern: str, root: PathLike = "."):
+        if os.path.isabs(pattern):
+            raise ValueError(f"FileSet patterns must be relative: {pattern}")
+        self.pattern = pattern
+        self.root = os.path.normpath(root)
+        self._key = (os.path.abspath(self.root), pattern)
+        self._files: List[Path] = []
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._scan: Optional[Iterator[Path]] = None
+        self._lock = threading.Lock()
+        parts = _split(pattern)
+        if not parts:
+            raise ValueError(f"Empty FileSet pattern: {pattern!r}")
+
+        cached = _scans.get(self._key)
+        if cached is not None and all(_mtime(d) == m for d, m in cached[0].items()):
+            self._mtimes, self._files = cached
+        else:
+            self._scan = self._walk("" if self.root == "." else self.root, parts)
+
+    def base(self) -> Tuple[Path, bool]:
+        """
+        The absolute directory all matches are found in, and whether they
+        may also be found in its subdirectories.
+        """
+        parts = _split(self.pattern)
+        literal: List[str] = []
+        for part in parts[:-1]:
+            if part == "**" or any(c in part for c in MAGIC):
+                break
+            literal.append(part)
+        rest = parts[len(literal):]
+        return Path(self._key[0], *literal), len(rest) > 1 or "**" in rest
+
+    def matches(self, path: PathLike) -> bool:
+        """Whether the given path would be matched, whether or not it exists."""
+        rel = os.path.relpath(os.path.abspath(path), self._key[0])
+        if rel == os.curdir or rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return False
+        return _match_parts(rel.split(os.sep), _split(self.pattern))
+
+    def _walk(self, directory: str, parts: Sequence[str]) -> Iterator[Path]:
+        part, rest = parts[0], parts[1:]
+        if part == "**":
+            yield from self._walk(directory, rest or ["*"])
+            for entry in self._list(directory):
+                # Symlinked directories aren't followed, they may loop.
+                if not entry.name.startswith(".") and _is_dir(entry, follow_symlinks=False):
+                    yield from self._walk(os.path.join(directory, entry.name), parts)
+            return
+
+        if not any(c in part for c in MAGIC):
+            # Not listed, but creating or deleting `part` changes it.
+            self._mtimes[directory] = _mtime(directory)
+            path = os.path.join(directory, part)
+            if not rest:
+                if os.path.lexists(path):
+                    yield Path(path)
+            elif os.path.isdir(path):
+                yield from self._walk(path, rest)
+            return
+
+        for entry in self._list(directory):
+            if _matches(entry.name, part):
+                path = os.path.join(directory, entry.name)
+                if not rest:
+                    yield Path(path)
+                elif _is_dir(entry):
+                    yield from self._walk(path, rest)
+
+    def _list(self, directory: str) -> List[os.DirEntry]:
+        self._mtimes[directory] = _mtime(directory)
+        return _listdir(directory)
+
+    def _next(self, n: int) -> bool:
+        """Scan until there are more than `n` files, or return False."""
+        with self._lock:
+            # Another thread may have found them while this one waited.
+            while len(self._files) <= n and self._scan is not None:
+                try:
+                    self._files.append(next(self._scan))
+                except StopIteration:
+                    self._scan = None
+                    _scans[self._key] = (self._mtimes, self._files)
+            return len(self._files) > n
+
+    def __iter__(self) -> Iterator[Path]:
+        n = 0
+        while n < len(self._files) or self._next(n):
+            yield self._files[n]
+            n += 1
+
+    def __len__(self) -> int:
+        while self._next(len(self._files)):
+            pass
+        return len(self._files)
+
+    def __bool__(self) -> bool:
+        return bool(self._files) or self._next(0)
+
+    def __repr__(self) -> str:
+        return f"FileSet({self.pattern!r}, root={self.root!r})"
@@ -0,0 +1,131 @@
+# --------------------------------------------------------------------
+# jobs.py: Job slots and resource pools limiting concurrent commands.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional
+
+from .config import CPU_CORES
+from .errors import BuildError, BuildHalted
+
+if TYPE_CHECKING:
+    from .profile import Profiler
+
+# --------------------------------------------------------------------
+LOAD_POLL_INTERVAL = 0.25
+
+
+# --------------------------------------------------------------------
+class JobSlots:
+    """
+    Limits how many jobs run at once.  Every job takes one of `jobs`
+    global slots, and optionally a slot in a named pool, e.g. a "link"
+    pool of 2 for memory-hungry link steps.  If `load_average` is given,
+    new jobs aren't started while the system load is at or above it and
+    other jobs are still running, like `make -l`.
+
+    Like make, no new jobs are started once a job fails, and the jobs
+    already running are left to finish.  If `keep_going` is set, jobs keep
+    being started, so everything that doesn't depend on the failure is
+    still built.  If `fail_fast` is set, the callbacks given to
+    `on_halt()` are called as well, e.g. to cancel the jobs still running.
+
+    Semaphores are created on first use, so a JobSlots object must only
+    be used within a single event loop.
+    """
+
+    def __init__(self, jobs: int = CPU_CORES, load_average: Optional[float] = None,
+                 pools: Optional[Dict[str, int]] = None,
+                 profiler: Optional["Profiler"] = None, fail_fast: bool = False,
+                 keep_going: bool = False):
+        if jobs < 1:
+            raise BuildError(f"Invalid number of jobs: {jobs}")
+        self.jobs = jobs
+        self.load_average = load_average
+        self.pool_sizes = {**(pools or {})}
+        self.running = 0
+        self.profiler = profiler
+        self.fail_fast = fail_fast
+        self.keep_going = keep_going
+        self.halted = False
+        self._halt_callbacks: List[Callable[[], Any]] = []
+        self.errors: List[Exception] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pools: Dict[str, asyncio.Semaphore] = {}
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.BoundedSemaphore(self.jobs)
+        return self._slots
+
+    def _get_pool(self, name: str) -> asyncio.Semaphore:
+        if name not in self._pools:
+            if name not in self.pool_sizes:
+                raise BuildError(f'Unknown job pool: "{name}".')
+            self._pools[name] = asyncio.BoundedSemaphore(self.pool_sizes[name])
+        return self._pools[name]
+
+    def _overloaded(self) -> bool:
+        if self.load_average is None or self.running == 0:
+            return False
+        try:
+            return os.getloadavg()[0] >= self.load_average
+        except OSError:
+            return False
+
+    def job_failed(self, error: Exception):
+        """Record a failed job, halting the build unless keeping going."""
+        if isinstance(error, BuildHalted) or any(e is error for e in self.errors):
+            return
+        self.errors.append(error)
+        if self.keep_going or self.halted:
+            return
+        self.halted = True
+        callbacks, self._halt_callbacks = self._halt_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_halt(self, callback: Callable[[], Any]):
+        """
+        Call `callback` when a failure halts the build with `fail_fast`
+        set, or now if it already has.
+        """
+        if not self.fail_fast:
+            return
+        if self.halted:
+            callback()
+        else:
+            self._halt_callbacks.append(callback)
+
+    @asynccontextmanager
+    async def acquire(self, pool: Optional[str] = None, label: str = "job") -> AsyncIterator[None]:
+        if self.halted:
+            raise BuildHalted()
+        started = self.profiler.now() if self.profiler else 0
+        pool_sem = self._get_pool(pool) if pool is not None else None
+        if pool_sem is not None:
+            await pool_sem.acquire()
+        try:
+            async with self._get_slots():
+                while self._overloaded():
+                    await asyncio.sleep(LOAD_POLL_INTERVAL)
+                if self.halted:
+                    raise BuildHalted()
+                if self.profiler:
+                    from .profile import WAIT, Slice
+                    self.profiler.slices.append(
+                        Slice(label, WAIT, started, self.profiler.now(), {"pool": pool}))
+                self.running += 1
+                try:
+                    yield
+                finally:
+                    self.running -= 1
+        finally:
+            if pool_sem is not None:
+                pool_sem.release()
@@ -0,0 +1,124 @@
+# --------------------------------------------------------------------
+# profile.py: Build timing profiler with Chrome trace export.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generator, List, Optional
+
+from ansilog import fg
+
+# --------------------------------------------------------------------
+RESOURCE = "resource"
+RECIPE = "recipe"
+WAIT = "wait"
+CATEGORIES = [RESOURCE, RECIPE, WAIT]
+DEFAULT_TOP_N = 10
+
+
+# --------------------------------------------------------------------
+@dataclass
+class Slice:
+    name: str
+    cat: str
+    start: int
+    end: int = 0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+
+# --------------------------------------------------------------------
+def format_ns(ns: int) -> str:
+    return "%.3fs" % (ns / 1e9)
+
+
+# --------------------------------------------------------------------
+class Profiler:
+    """
+    Records timing slices for resources, recipes, and time spent waiting
+    for job slots, and exports them in the Chrome Trace Event format
+    understood by chrome://tracing and Perfetto.
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter_ns()
+        self.slices: List[Slice] = []
+
+    def now(self) -> int:
+        return time.perf_counter_ns() - self._origin
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args) -> Generator[Slice, None, None]:
+        s = Slice(name, cat, self.now(), args=args)
+        try:
+            yield s
+        finally:
+            s.end = self.now()
+            self.slices.append(s)
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for pid, cat in enumerate(CATEGORIES, start=1):
+            events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0,
+                           "args": {"name": cat}})
+            lanes: List[int] = []
+            for s in sorted((s for s in self.slices if s.cat == cat), key=lambda s: s.start):
+                # Slices on the same thread must nest, so overlapping
+                # slices are spread across as many lanes as needed.
+                for tid, lane_end in enumerate(lanes):
+                    if lane_end <= s.start:
+                        lanes[tid] = s.end
+                        break
+                else:
+                    tid = len(lanes)
+                    lanes.append(s.end)
+                events.append({"ph": "X", "name": s.name, "cat": s.cat, "pid": pid,
+                               "tid": tid, "ts": s.start / 1e3, "dur": s.duration / 1e3,
+                               "args": s.args})
+        return events
+
+    def write(self, filename: str):
+        with open(filename, "w") as outfile:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, outfile)
+
+    def critical_path(self, dependencies: Dict[str, List[str]]) -> List[Slice]:
+        """
+        Find the chain of resources that bounded the build's wall clock
+        time.  Starting with the resource that finished last, follow the
+        dependency that finished last, as that is the one which held up
+        its dependent.
+        """
+        resources = {s.name: s for s in self.slices if s.cat == RESOURCE}
+        path: List[Slice] = []
+        current: Optional[Slice] = max(resources.values(), key=lambda s: s.end, default=None)
+        while current is not None:
+            path.append(current)
+            deps = [resources[d] for d in dependencies.get(current.name, []) if d in resources]
+            current = max(deps, key=lambda s: s.end, default=None)
+        return list(reversed(path))
+
+    def slowest(self, cat: str = RECIPE, n: int = DEFAULT_TOP_N) -> List[Slice]:
+        return sorted((s for s in self.slices if s.cat == cat),
+                      key=lambda s: s.duration, reverse=True)[:n]
+
+    def summarize(self, log: logging.Logger, dependencies: Dict[str, List[str]],
+                  n: int = DEFAULT_TOP_N):
+        log.info("")
+        log.info(fg.blue("Critical path:"))
+        for s in self.critical_path(dependencies):
+            log.info("  %s %s", format_ns(s.duration).rjust(10), fg.yellow(s.name))
+        log.info(fg.blue(f"Slowest {n} recipes:"))
+        for s in self.slowest(RECIPE, n):
+            log.info("  %s %s", format_ns(s.duration).rjust(10), s.name)
+        waited = sum(s.duration for s in self.slices if s.cat == WAIT)
+        log.info(fg.blue("Total time waiting for job slots: ") + format_ns(waited))
@@ -0,0 +1,250 @@
+# --------------------------------------------------------------------
+# python.py: Python functions as recipes, run in a process pool.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import asyncio
+import functools
+import json
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set
+
+from ansilog import fg
+
+from .cas import unshare
+from .errors import BuildError
+from .recipes import FileRecipe
+from .reports import Report
+from .util import canonical, freeze, get_logger
+
+# --------------------------------------------------------------------
+log = get_logger("panifex")
+
+# --------------------------------------------------------------------
+# Functions decorated with `cpu()`, by key.  The decorated name no
+# longer refers to the function itself, so it can't be pickled by
+# reference.  Workers are forked after the build script is loaded and
+# find it here instead.
+_functions: Dict[str, Callable] = {}
+
+
+# --------------------------------------------------------------------
+def _call(key: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    return _functions[key](*args, **kwargs)
+
+
+# --------------------------------------------------------------------
+def _qualname(func: Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+# --------------------------------------------------------------------
+def _mp_context():
+    # Fork, so that workers inherit the build script and `_functions`.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+# --------------------------------------------------------------------
+@dataclass
+class PythonReport(Report):
+    name: str
+    started: Optional[datetime]
+    finished: Optional[datetime]
+    call: str
+    error: Optional[str]
+
+    def succeeded(self):
+        return self.error is None
+
+    def generate(self, include_output: bool = True):
+        return {
+            **super().generate(),
+            "call": self.call,
+            "error": self.error,
+        }
+
+
+# --------------------------------------------------------------------
+class PythonFailed(BuildError):
+    def __init__(self, report: PythonReport):
+        reason = "" if report.error is None else f": {report.error}"
+        super().__init__(f"{report.name} failed: {report.call}{reason}")
+        self.report = report
+
+
+# -------------------------------------------------------------------
+class PythonRecipe(FileRecipe):
+    """
+    Calls a Python function in a worker process, so that CPU-bound steps
+    run in parallel across cores.  Each call takes a job slot, and the
+    pool has as many workers as there are job slots.
+
+    Like a shell command, the recipe is up to date if its `output` files
+    are newer than its `input` files and the call hasn't changed.  If
+    given, `input` and `output` are passed to the function as keyword
+    arguments.  The recipe's value is its `output`, or the function's
+    return value if it has none.  Arguments and return values must be
+    picklable.
+    """
+
+    IN = "input"
+    OUT = "output"
+    INCLUDES = "includes"
+
+    _executor: Optional[ProcessPoolExecutor] = None
+    _pending: Set[Future] = set()
+
+    __slots__ = ("_func", "_key", "_args", "_kwargs", "_input", "_includes", "_output",
+                 "_name", "_pool", "_echo", "_result", "_error")
+
+    def __init__(self, func: Callable, *args, **kwargs):
+        super().__init__()
+        # Generators, e.g. from Path.glob(), can only be iterated once.
+        kwargs = freeze(kwargs)
+
+        self._func = func
+        self._key: Optional[str] = getattr(func, "__panifex_key__", None)
+        self._args = args
+        self._input = kwargs.get(self.IN, None)
+        self._includes = kwargs.pop(self.INCLUDES, None)
+        self._output = kwargs.get(self.OUT, None)
+        self._kwargs = kwargs
+        self._name = "Python Function"
+        self._pool: Optional[str] = None
+        self._echo = True
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+
+    @classmethod
+    def executor(cls, workers: int) -> ProcessPoolExecutor:
+        """Get the process pool, starting it on first use."""
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(workers, mp_context=_mp_context())
+        return cls._executor
+
+    @classmethod
+    def shutdown(cls):
+        """Stop the process pool, if it was started."""
+        if cls._executor is not None:
+            # Drop the calls that haven't started, like `cancel_futures`
+            # does on Python 3.9 and later.
+            for future in list(cls._pending):
+                future.cancel()
+            cls._executor.shutdown()
+            cls._executor = None
+
+    def with_name(self, name: str):
+        self._name = name
+        return self
+
+    def with_pool(self, pool: str):
+        """Run this call in the named job pool, see `build.pool()`."""
+        self._pool = pool
+        return self
+
+    def no_echo(self):
+        self._echo = False
+        return self
+
+    def title(self) -> str:
+        args = [repr(arg) for arg in self._args]
+        args.extend(f"{k}={v!r}" for k, v in self._kwargs.items())
+        return f"{self._func.__qualname__}({', '.join(args)})"
+
+    def _decorated_title(self) -> str:
+        return " " + self.title()
+
+    async def _resolve(self) -> Any:
+        async with self.jobs.acquire(self._pool, self.title()):
+            for path in self._paths(self._output):
+                unshare(path)
+            if self._echo:
+                log.info(fg.magenta("[py]") + self._decorated_title())
+
+            if self._key is not None:
+                call = functools.partial(_call, self._key, self._args, self._kwargs)
+            else:
+                call = functools.partial(self._func, *self._args, **self._kwargs)
+            future = self.executor(self.jobs.jobs).submit(call)
+            self._pending.add(future)
+            future.add_done_callback(self._pending.discard)
+            try:
+                self._result = await asyncio.wrap_future(future)
+            except Exception as e:
+                # Exceptions raised by the function, or because the call
+                # couldn't be pickled.  Reported by `_check_success()`.
+                self._error = e
+            finally:
+                self.finish()
+        return self.output()
+
+    def _check_success(self):
+        if not self.succeeded():
+            raise PythonFailed(self.report()) from self._error
+
+    def succeeded(self):
+        return self.is_done() and self._error is None
+
+    def signature(self) -> Dict[str, Any]:
+        return {
+            **super().signature(),
+            "func": _qualname(self._func),
+            "call": self._call_signature(),
+        }
+
+    def _call_signature(self) -> str:
+        """Like `title()`, but the same from one build to the next."""
+        args = [json.dumps(canonical(arg)) for arg in self._args]
+        args.extend(f"{k}={json.dumps(canonical(v))}" for k, v in sorted(self._kwargs.items()))
+        return f"{self._func.__qualname__}({', '.join(args)})"
+
+    def _explain_change(self, name: str, old: Any, new: Any) -> str:
+        if name == "func":
+            return f"the function changed, it was: {old}"
+        if name == "call":
+            return f"the arguments changed, it was: {old}"
+        return super()._explain_change(name, old, new)
+
+    def _output_files(self) -> Any:
+        # Only declared outputs, the return value is never taken for files.
+        return self._output
+
+    def input(self) -> Any:
+        return [self._input, self._includes]
+
+    def output(self) -> Any:
+        return self._result if self._output is None else self._output
+
+    def report(self) -> PythonReport:
+        return PythonReport(
+            name=self._name,
+            started=self.started,
+            finished=self.finished,
+            call=self.title(),
+            error=None if self._error is None else f"{type(self._error).__name__}: {self._error}",
+        )
+
+
+# --------------------------------------------------------------------
+def cpu(func: Callable) -> Callable[..., PythonRecipe]:
+    """
+    Decorate a module level function so that calling it returns a
+    `PythonRecipe` which runs it in the build's process pool.
+    """
+    key = _qualname(func)
+    _functions[key] = func
+    func.__panifex_key__ = key  # type: ignore
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> PythonRecipe:
+        return PythonRecipe(func, *args, **kwargs)
+
+    return wrapper
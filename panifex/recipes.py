@@ -7,38 +7,88 @@
 # Distributed under terms of the MIT license.
 # --------------------------------------------------------------------
 import asyncio
-import shutil
+import os
+import weakref
+from contextvars import ContextVar
 from datetime import datetime
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Set, Union
 
 import xeno
 from ansilog import bg, fg
 
-from .errors import BuildError
-from .reports import BuildReport, Report
-from .util import get_logger, is_iterable
+from .clean import Cleaner
+from .config import Config
+from .db import BuildDatabase, FileDigests
+from .errors import AggregateError, BuildError
+from .fileset import FileSet
+from .jobs import JobSlots
+from .reports import BuildReport, JobReport, Report, ReportWriter
+from .stats import StatCache
+from .util import get_logger, is_iterable, relative_path
+
+if TYPE_CHECKING:
+    from .cas import ArtifactCache
+    from .profile import Profiler
 
 # -------------------------------------------------------------------
 log = get_logger("panifex")
 
+# -------------------------------------------------------------------
+# Collects the inputs of file recipes made while resolving a resource,
+# so that the resource can be rebuilt when they change.  FileSets are
+# kept whole, so that new files matching them are noticed too.
+resource_inputs: ContextVar[Optional[Set[Union[Path, FileSet]]]] = ContextVar(
+    "resource_inputs", default=None)
+
 
 # -------------------------------------------------------------------
 class Recipe:
+    __slots__ = ("created", "started", "finished", "skipped", "would_run", "__weakref__")
+
     cleaning = False
-    config = None
+    config: Optional[Config] = None
+    database: Optional[BuildDatabase] = None
+    digests = FileDigests()
+    artifacts: Optional["ArtifactCache"] = None
+    cleaner = Cleaner()
+    report_writer: Optional[ReportWriter] = None
+    jobs = JobSlots()
+    profiler: Optional["Profiler"] = None
+    stats = StatCache()
+    # Absolute paths of the outputs a dry run would rebuild.
+    planned: Set[str] = set()
 
     def __init__(self):
         self.created = datetime.now()
         self.started: Optional[datetime] = None
         self.finished: Optional[datetime] = None
         self.skipped = False
+        self.would_run = False
         RecipeHistory.add(self)
 
     async def __await__(self) -> Any:
         return await self.make(targeted=False)
 
     async def make(self, targeted=False) -> Any:
+        try:
+            if self.profiler is None:
+                return await self._make(targeted)
+
+            from .profile import RECIPE
+            with self.profiler.span(self.title(), RECIPE) as span:
+                result = await self._make(targeted)
+                span.name = self.title()
+                span.args["skipped"] = self.skipped
+            return result
+
+        finally:
+            if self.finished is not None:
+                RecipeHistory.finish(self)
+                if self.report_writer is not None:
+                    self.report_writer.write(self.report(), skipped=self.skipped)
+
+    async def _make(self, targeted=False) -> Any:
         self.started = datetime.now()
 
         if self.cleaning:
@@ -46,20 +96,55 @@ class Recipe:
                 await self._clean()
             else:
                 return self.output()
-        elif not self.is_done():
-            await self._resolve()
+        elif not await self._check_done():
+            if self.config and self.config.dry_run:
+                self._dry_run()
+            else:
+                if self.config and self.config.explain:
+                    self._log_explanation()
+                await self._resolve()
+                self._invalidate_outputs()
         else:
             self.skipped = True
 
         self.finish()
+        if self.cleaning or (self.config and self.config.dry_run):
+            return self.output()
         self._check_success()
 
+        if not self.cleaning and not self.skipped:
+            self._record()
+
         return self.output()
 
     def _check_success(self):
         if not self.succeeded():
             raise BuildError("A recipe failed.")
 
+    def title(self) -> str:
+        return type(self).__name__
+
+    def explain(self) -> Optional[str]:
+        """Describe why this recipe needs to run, or None if it doesn't."""
+        return None if self.is_done() else "it hasn't run yet"
+
+    def _dry_run(self):
+        self.would_run = True
+        log.info(fg.yellow("[dry]") + self._decorated_title())
+        if self.config and self.config.explain:
+            self._log_explanation()
+
+    def _decorated_title(self) -> str:
+        return " " + self.title()
+
+    def _subject(self) -> str:
+        return self.title()
+
+    def _log_explanation(self):
+        reason = self.explain()
+        if reason is not None:
+            log.info(fg.cyan("[why] ") + f"{self._subject()}: {reason}")
+
     def input(self) -> Any:
         raise NotImplementedError()
 
@@ -75,9 +160,19 @@ class Recipe:
     async def clean(self) -> None:
         return await self._clean()
 
+    def _record(self) -> None:
+        pass
+
+    def _invalidate_outputs(self) -> None:
+        pass
+
     def is_done(self) -> bool:
         return self.finished is not None
 
+    async def _check_done(self) -> bool:
+        """Decide if the recipe needs to run, see `is_done()`."""
+        return self.is_done()
+
     def finish(self):
         if self.finished is None:
             self.finished = datetime.now()
@@ -101,9 +196,35 @@ class Recipe:
         raise NotImplementedError()
 
 
+# -------------------------------------------------------------------
+class JobRecord:
+    """
+    A compact record of a finished recipe.  The recipe itself is only
+    weakly referenced, so that it and its output can be freed as soon as
+    the build is done with it.
+    """
+
+    __slots__ = ("recipe", "title", "started", "finished", "ok", "skipped", "would_run")
+
+    def __init__(self, recipe: Recipe):
+        self.recipe = weakref.ref(recipe)
+        self.title = recipe.title()
+        self.started = recipe.started
+        self.finished = recipe.finished
+        self.ok = recipe.succeeded()
+        self.skipped = recipe.skipped
+        self.would_run = recipe.would_run
+
+    def report(self) -> Report:
+        recipe = self.recipe()
+        if recipe is not None:
+            return recipe.report()
+        return JobReport(self.title, self.started, self.finished, self.ok)
+
+
 # -------------------------------------------------------------------
 class RecipeHistory:
-    _history: List[Recipe] = []
+    _history: List[JobRecord] = []
     _started: Optional[datetime] = None
     _finished: Optional[datetime] = None
 
@@ -111,7 +232,10 @@ class RecipeHistory:
     def add(cls, recipe: Recipe):
         if cls._started is None:
             cls._started = datetime.now()
-        cls._history.append(recipe)
+
+    @classmethod
+    def finish(cls, recipe: Recipe):
+        cls._history.append(JobRecord(recipe))
 
     @classmethod
     def get(cls):
@@ -122,7 +246,8 @@ class RecipeHistory:
         if not cls._finished:
             cls._finished = datetime.now()
         return BuildReport(name=name, started=cls._started, finished=cls._finished,
-                           job_reports=[j.report() for j in cls._history])
+                           job_reports=[j.report() for j in cls._history],
+                           cache=Recipe.artifacts.stats() if Recipe.artifacts else None)
 
     @classmethod
     def clear(cls):
@@ -133,45 +258,228 @@ class RecipeHistory:
 
 # -------------------------------------------------------------------
 class FileRecipe(Recipe):
+    __slots__ = ("_db_fresh",)
+
+    def __init__(self):
+        super().__init__()
+        self._db_fresh = False
+
+    async def _make(self, targeted=False) -> Any:
+        try:
+            return await super()._make(targeted)
+        finally:
+            inputs = resource_inputs.get()
+            if inputs is not None:
+                inputs.update(self._watched(self.dependencies()))
+
+    async def _check_done(self) -> bool:
+        # Stats, digests and depfiles block on the filesystem, so check
+        # on a worker thread and let other recipes make progress.
+        return await asyncio.get_running_loop().run_in_executor(None, self.is_done)
+
     async def _clean(self, value=xeno.NOTHING) -> None:
+        """
+        Queue the outputs for deletion.  The engine deletes everything that
+        was queued in one batch once all recipes have been cleaned.
+        """
         if value is xeno.NOTHING:
-            await self._clean(self.output())
+            value = self._output_files()
+        for path in self._paths(value):
+            self.cleaner.add(path)
 
-        elif is_iterable(value):
-            await asyncio.gather(*[self._clean(v) for v in value])
+    async def clean(self) -> None:
+        """
+        Delete the outputs.  While the build is cleaning, they are only
+        queued and the engine deletes them along with everything else.
+        """
+        await self._clean()
+        if not self.cleaning:
+            result = await self.cleaner.run()
+            self._invalidate_outputs()
+            if result.errors:
+                raise AggregateError(list(result.errors))
+
+    def _invalidate_outputs(self):
+        for path in self._paths(self._output_files()):
+            self.stats.invalidate(path)
+
+    def _dry_run(self):
+        super()._dry_run()
+        self.planned.update(os.path.abspath(p) for p in self._paths(self._output_files()))
+
+    def _subject(self) -> str:
+        return ", ".join(str(p) for p in self._paths(self._output_files())) or self.title()
+
+    def _planned_input(self) -> Optional[Path]:
+        """Find an input that a dry run has already decided to rebuild."""
+        if self.planned:
+            for path in self._paths(self.dependencies()):
+                if os.path.abspath(path) in self.planned:
+                    return path
+        return None
+
+    def _output_files(self) -> Any:
+        """
+        The files this recipe writes, which decide whether it's done.  These
+        are its output, unless a subclass outputs some other value.
+        """
+        return self.output()
 
-        elif value is not None:
-            file = Path(value)
-            if file.exists():
-                log.info(fg.green('[ok]') + fg.magenta(' delete ') + str(file))
-                if file.is_file():
-                    file.unlink()
-                elif file.is_dir():
-                    shutil.rmtree(file)
+    def dependencies(self) -> Any:
+        """
+        The files that decide whether this recipe is up to date.  These are
+        its inputs, unless a subclass knows of a more precise set.
+        """
+        return self.input()
 
     def _get_input_mtime(self, value=xeno.NOTHING):
         if value is xeno.NOTHING:
-            return self._get_input_mtime(self.input())
-        if isinstance(value, str):
-            return self._get_input_mtime(Path(value))
-        if isinstance(value, Path):
-            return value.stat().st_mtime if value.exists() else 0
-        if is_iterable(value):
-            return max(self._get_input_mtime(x) for x in value)
-        return 0
+            value = self.dependencies()
+        return max((self.stats.mtime(p) for p in self._paths(value)), default=0)
+
+    def _paths(self, value) -> Generator[Path, None, None]:
+        if isinstance(value, (str, Path)):
+            yield Path(value)
+        elif is_iterable(value):
+            for v in value:
+                yield from self._paths(v)
+
+    def _watched(self, value) -> Generator[Union[Path, FileSet], None, None]:
+        if isinstance(value, FileSet):
+            yield value
+        elif isinstance(value, (str, Path)):
+            yield Path(value)
+        elif is_iterable(value):
+            for v in value:
+                yield from self._watched(v)
+
+    def _db_key(self) -> Optional[str]:
+        outputs = list(self._paths(self._output_files()))
+        return BuildDatabase.key(outputs) if outputs else None
+
+    def signature(self) -> Dict[str, Any]:
+        """
+        Describe everything that determines this recipe's outputs, other
+        than the outputs themselves.  Subclasses extend this with e.g. the
+        command they run.
+        """
+        return {"inputs": self._digest_inputs(self.dependencies())}
+
+    def _digest_inputs(self, value: Any) -> Dict[str, Optional[str]]:
+        # Paths relative to the project, so that e.g. the remote artifact
+        # cache is shared between checkouts in different places.
+        root = os.getcwd()
+        digests = self.digests.digest_all(self._paths(value))
+        return {relative_path(k, root): v for k, v in digests.items()}
+
+    def _check_database(self) -> Optional[bool]:
+        """
+        Decide if the recipe is up to date from the build database.  Returns
+        None if the database has no opinion, in which case the caller should
+        fall back to comparing timestamps.
+        """
+        key = self._db_key()
+        if self.database is None or key is None:
+            return None
+        record = self.database.get(key)
+        if record is None:
+            return None
+        self._load_record(record)
+
+        outputs = self.database.digest_all(self._paths(self._output_files()))
+        if None in outputs.values():
+            return False
+        return record["outputs"] == outputs and record["signature"] == self.signature()
+
+    def explain(self) -> Optional[str]:
+        if self.cleaning:
+            return super().explain()
+        planned = self._planned_input()
+        if planned is not None:
+            return f"input {planned} will be rebuilt"
+
+        outputs = list(self._paths(self._output_files()))
+        if not outputs:
+            return "it has no outputs, so it always runs"
+        for path in outputs:
+            if not self.stats.exists(path):
+                return f"output {path} is missing"
+
+        key = self._db_key()
+        record = self.database.get(key) if self.database is not None and key else None
+        if record is not None:
+            return self._explain_record(record, outputs)
+
+        newest = max(self._paths(self.dependencies()), key=self.stats.mtime, default=None)
+        oldest = min(outputs, key=self.stats.mtime)
+        if newest is not None and self.stats.mtime(newest) >= self.stats.mtime(oldest):
+            return f"input {newest} is newer than output {oldest}"
+        return None
+
+    def _explain_record(self, record: Dict[str, Any], outputs: List[Path]) -> Optional[str]:
+        self._load_record(record)
+        digests = self.digests.digest_all(outputs)
+        for path, digest in digests.items():
+            if record["outputs"].get(path) != digest:
+                return f"output {path} was modified since it was built"
+
+        old, new = record["signature"], self.signature()
+        old_inputs, new_inputs = old.get("inputs", {}), new.get("inputs", {})
+        for path in new_inputs:
+            if path not in old_inputs:
+                return f"{path} is a new input"
+            if old_inputs[path] != new_inputs[path]:
+                return f"input {path} changed"
+        for path in old_inputs:
+            if path not in new_inputs:
+                return f"{path} is no longer an input"
+        for name in sorted(set(old) | set(new)):
+            if old.get(name) != new.get(name):
+                return self._explain_change(name, old.get(name), new.get(name))
+        return None
+
+    def _explain_change(self, name: str, old: Any, new: Any) -> str:
+        """Describe a change in the named part of the recipe's signature."""
+        return f"its {name} changed"
+
+    def _record(self):
+        key = self._db_key()
+        if self.database is None or key is None:
+            return
+        outputs = self.database.digest_all(self._paths(self._output_files()))
+        if None in outputs.values():
+            self.database.forget(key)
+        else:
+            self.database.put(key, self._make_record(outputs))
+
+    def _load_record(self, record: Dict[str, Any]):
+        """Restore state saved by `_make_record()` from a previous build."""
+
+    def _make_record(self, outputs: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        return {"signature": self.signature(), "outputs": outputs}
 
     def is_done(self, value=xeno.NOTHING) -> bool:
         if value is xeno.NOTHING:
-            return self.is_done(self.output())
+            if not self.cleaning:
+                if self._planned_input() is not None:
+                    return False
+                if self._db_fresh:
+                    return True
+                if self.finished is None:
+                    verdict = self._check_database()
+                    if verdict is not None:
+                        self._db_fresh = verdict
+                        return verdict
+            return self.is_done(self._output_files())
         if is_iterable(value):
             return all(self.is_done(v) for v in value)
         if isinstance(value, (str, Path)):
-            output_file = Path(value)
+            st = self.stats.stat(value)
             if self.cleaning:
-                return not output_file.exists()
-            if not output_file.exists():
+                return st is None
+            if st is None:
                 return False
-            return self._get_input_mtime() < output_file.stat().st_mtime
+            return self._get_input_mtime() < st.st_mtime
         elif self.cleaning:
             return True
         else:
@@ -0,0 +1,180 @@
+# --------------------------------------------------------------------
+# remote.py: Shared artifact cache backends and a small HTTP server.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import argparse
+import io
+import os
+import re
+import tarfile
+import tempfile
+import urllib.error
+import urllib.request
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from .util import get_logger
+
+# --------------------------------------------------------------------
+DEFAULT_PORT = 8377
+DEFAULT_TIMEOUT = 30.0
+COMPRESS_LEVEL = 6
+CONTENT_TYPE = "application/x-tar+gzip"
+KEY_PATTERN = re.compile(r"^/([0-9a-f]{64})$")
+
+# --------------------------------------------------------------------
+log = get_logger("panifex")
+
+
+# --------------------------------------------------------------------
+def pack(entry: Path) -> bytes:
+    """Pack a local cache entry directory into a compressed archive."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz", compresslevel=COMPRESS_LEVEL) as tar:
+        for path in sorted(entry.iterdir()):
+            tar.add(path, arcname=path.name, recursive=False)
+    return buffer.getvalue()
+
+
+# --------------------------------------------------------------------
+def unpack(data: bytes, entry: Path):
+    """Unpack an archive made by `pack()` into the given directory."""
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        members = tar.getmembers()
+        for member in members:
+            if not member.isfile() or "/" in member.name or member.name.startswith("."):
+                raise ValueError(f"Unexpected archive member: {member.name}")
+        tar.extractall(entry, members=members)
+
+
+# --------------------------------------------------------------------
+class CacheBackend:
+    """
+    A shared store of packed artifact cache entries.  Methods are blocking
+    and are called from worker threads, so many transfers can be in
+    flight at once without holding any job slots.
+    """
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Fetch the packed entry for the given key, or None if missing."""
+        raise NotImplementedError()
+
+    def put(self, key: str, data: bytes):
+        raise NotImplementedError()
+
+
+# --------------------------------------------------------------------
+class HttpCacheBackend(CacheBackend):
+    """
+    A cache backend speaking plain HTTP: `GET <url>/<key>` to fetch an
+    entry and `PUT <url>/<key>` to store one.  Works with the bundled
+    `CacheServer` as well as with WebDAV or nginx style file servers.
+    """
+
+    def __init__(self, url: str, timeout: float = DEFAULT_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with urllib.request.urlopen(f"{self.url}/{key}", timeout=self.timeout) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == HTTPStatus.NOT_FOUND:
+                return None
+            raise
+
+    def put(self, key: str, data: bytes):
+        request = urllib.request.Request(
+            f"{self.url}/{key}", data=data, method="PUT",
+            headers={"Content-Type": CONTENT_TYPE})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+# --------------------------------------------------------------------
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    server: "CacheServer"
+
+    def _path(self) -> Optional[Path]:
+        match = KEY_PATTERN.match(self.path)
+        if match is None:
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return None
+        key = match.group(1)
+        return self.server.root / key[:2] / key
+
+    def do_GET(self):
+        path = self._path()
+        if path is None:
+            return
+        try:
+            with open(path, "rb") as infile:
+                data = infile.read()
+        except FileNotFoundError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_PUT(self):
+        path = self._path()
+        if path is None:
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+        with os.fdopen(fd, "wb") as outfile:
+            outfile.write(data)
+        os.replace(tmp, path)
+        self.send_response(HTTPStatus.CREATED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        log.debug("%s %s", self.address_string(), format % args)
+
+
+# --------------------------------------------------------------------
+class CacheServer(ThreadingHTTPServer):
+    """A tiny HTTP cache server storing packed entries in a directory."""
+
+    def __init__(self, root: Path, address=("127.0.0.1", DEFAULT_PORT)):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        super().__init__(address, CacheRequestHandler)
+
+    def serve(self):
+        host, port = self.server_address[:2]
+        log.info("Serving artifact cache %s on http://%s:%d", self.root, host, port)
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server_close()
+
+
+# --------------------------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Serve a shared panifex artifact cache.")
+    parser.add_argument("root", metavar="DIR")
+    parser.add_argument("-b", "--bind", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    CacheServer(Path(args.root), (args.bind, args.port)).serve()
+
+
+# --------------------------------------------------------------------
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,30 @@
 #
 # Distributed under terms of the MIT license.
 # --------------------------------------------------------------------
+import functools
 import getpass
+import itertools
+import json
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime
+from pathlib import Path
 
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Union
 from .util import format_dt
 
+# --------------------------------------------------------------------
+# Report ids are unique per process plus a counter, rather than a fresh
+# uuid4() per report.
+SESSION_ID = uuid.uuid4().hex
+_report_ids = itertools.count()
+
+
+# --------------------------------------------------------------------
+@functools.lru_cache(maxsize=None)
+def get_user() -> str:
+    return getpass.getuser()
+
 
 # --------------------------------------------------------------------
 # pylint: disable=R0201
@@ -24,7 +40,7 @@ class Report:
     finished: Optional[datetime]
 
     def __post_init__(self):
-        self.id = str(uuid.uuid4())
+        self.id = f"{SESSION_ID}-{next(_report_ids)}"
 
     def succeeded(self) -> bool:
         return True
@@ -32,7 +48,11 @@ class Report:
     def failed(self) -> bool:
         return not self.succeeded()
 
-    def generate(self):
+    def output_lines(self) -> Iterable[Any]:
+        """The output lines of the job, as objects with a `json()` method."""
+        return ()
+
+    def generate(self, include_output: bool = True):
         return {
             "type": type(self).__qualname__,
             "name": self.name,
@@ -43,6 +63,16 @@ class Report:
         }
 
 
+# --------------------------------------------------------------------
+@dataclass
+class JobReport(Report):
+    """The summary of a finished job whose recipe no longer exists."""
+    ok: bool = True
+
+    def succeeded(self) -> bool:
+        return self.ok
+
+
 # --------------------------------------------------------------------
 @dataclass
 class BuildReport(Report):
@@ -50,14 +80,85 @@ class BuildReport(Report):
     started: Optional[datetime]
     finished: Optional[datetime]
     job_reports: List[Report] = field(default_factory=list)
+    cache: Optional[Dict[str, Any]] = None
 
     def __post_init__(self):
         super().__post_init__()
         self.job_reports.sort(key=lambda x: x.started)
 
-    def generate(self):
-        return {
+    def generate(self, include_output: bool = True):
+        result = {
             **super().generate(),
-            "user": getpass.getuser(),
-            "jobs": {j.id: j.generate() for j in self.job_reports},
+            "user": get_user(),
+            "jobs": {j.id: j.generate(include_output) for j in self.job_reports},
+        }
+        if self.cache is not None:
+            result["cache"] = self.cache
+        return result
+
+
+# --------------------------------------------------------------------
+class ReportWriter:
+    """
+    Streams a build report to a JSON Lines file as the build runs: a
+    header record, one record per job as soon as it finishes, and a
+    summary record.  Job output isn't embedded in the records, it is
+    appended to a companion `<file>.output` JSON Lines file instead and
+    referenced by byte offset and line count, so memory use doesn't grow
+    with the size of the build.
+    """
+
+    def __init__(self, path: Union[str, Path], name: str = "Build Report"):
+        self.path = Path(path)
+        self.output_path = Path(str(self.path) + ".output")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w")
+        self._output = open(self.output_path, "wb")
+        self.jobs = 0
+        self.failures = 0
+        self.started = datetime.now()
+        self._write({
+            "type": "BuildReport",
+            "name": name,
+            "id": SESSION_ID,
+            "user": get_user(),
+            "started": format_dt(self.started),
+        })
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + "\n")
+
+    def _write_output(self, lines: Iterable[Any]) -> Optional[Dict[str, Any]]:
+        offset = self._output.tell()
+        count = 0
+        for line in lines:
+            self._output.write(json.dumps(line.json()).encode("utf-8") + b"\n")
+            count += 1
+        if count == 0:
+            return None
+        return {"file": self.output_path.name, "offset": offset, "lines": count}
+
+    def write(self, report: Report, **extra):
+        record = {**report.generate(include_output=False), **extra}
+        output = self._write_output(report.output_lines())
+        if output is not None:
+            record["output"] = output
+        self._write(record)
+        self.jobs += 1
+        self.failures += report.failed()
+
+    def close(self, succeeded: bool, cache: Optional[Dict[str, Any]] = None):
+        record: Dict[str, Any] = {
+            "type": "BuildSummary",
+            "id": SESSION_ID,
+            "started": format_dt(self.started),
+            "finished": format_dt(datetime.now()),
+            "succeeded": succeeded,
+            "jobs": self.jobs,
+            "failures": self.failures,
         }
+        if cache is not None:
+            record["cache"] = cache
+        self._write(record)
+        self._file.close()
+        self._output.close()
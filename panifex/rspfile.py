@@ -0,0 +1,50 @@
+# --------------------------------------------------------------------
+# rspfile.py: Content-addressed `@file` response files.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import hashlib
+import os
+import shlex
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Union
+
+from .config import DEFAULT_RSPFILE_DIR
+
+# --------------------------------------------------------------------
+PathLike = Union[str, Path]
+
+
+# --------------------------------------------------------------------
+def rspfile_content(args: Iterable[Any]) -> str:
+    """
+    One argument per line, quoted like for the shell, which gcc, clang,
+    ld and ar all read back.
+    """
+    return "".join(shlex.quote(str(arg)) + "\n" for arg in args)
+
+
+# --------------------------------------------------------------------
+def rspfile_path(content: str, directory: PathLike = DEFAULT_RSPFILE_DIR) -> Path:
+    digest = hashlib.sha256(content.encode("utf-8", "surrogateescape")).hexdigest()
+    return Path(os.path.abspath(directory)) / f"{digest[:32]}.rsp"
+
+
+# --------------------------------------------------------------------
+def write_rspfile(content: str, directory: PathLike = DEFAULT_RSPFILE_DIR) -> Path:
+    """
+    Write a response file named after its content, unless it already
+    exists, and return its absolute path.
+    """
+    path = rspfile_path(content, directory)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+        with os.fdopen(fd, "w", encoding="utf-8", errors="surrogateescape") as outfile:
+            outfile.write(content)
+        os.replace(tmp, path)
+    return path
@@ -9,28 +9,87 @@
 import asyncio
 import os
 import shlex
+import signal
 import subprocess
+import tempfile
+import time
+import weakref
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Callable, Dict, Generator, List, Optional, Tuple, Union
+from pathlib import Path
+from typing import (Any, Callable, Deque, Dict, Generator, Iterable, Iterator, List, Mapping,
+                    Optional, Tuple, Union)
 
+import xeno
 from ansilog import bg, fg
 
-from .config import CPU_CORES
+from .config import DEFAULT_RSPFILE_SIZE
+from .depfile import read_depfile
 from .errors import BuildError
 from .recipes import FileRecipe
 from .reports import Report
-from .util import digest_env, format_dt, get_logger, is_iterable, decode
+from .rspfile import rspfile_content, rspfile_path, write_rspfile
+from .template import CommandTemplate
+from .util import (decode, digest_env, format_dt, freeze, get_logger, is_iterable,
+                   relative_path, stable_order)
 
 # -------------------------------------------------------------------
 LineSinkFunction = Callable[[str], None]
-ShellOutputTaskData = Tuple[asyncio.StreamReader, LineSinkFunction]
+SpooledLine = Tuple[int, bool, str]
+
+# -------------------------------------------------------------------
+COLLECT_CHUNK_SIZE = 1 << 16
+MAX_LINE_LENGTH = 1 << 20
+DEFAULT_SPOOL_LINES = 1000
+SPOOL_BATCH_LINES = 256
+KILL_GRACE_SECONDS = 5.0
 
 
 # --------------------------------------------------------------------
 log = get_logger("panifex")
 
 
+# --------------------------------------------------------------------
+class SharedEnv(Mapping[str, Any]):
+    """
+    A read-only environment shared by many shell recipes.  Its digested
+    form, and the variables that differ from the process environment,
+    are computed once rather than for every recipe.
+    """
+
+    __slots__ = ("_env", "_digested", "_changes")
+
+    def __init__(self, env: Mapping[str, Any]):
+        self._env = freeze(env)
+        self._digested: Optional[Dict[str, str]] = None
+        self._changes: Optional[Dict[str, str]] = None
+
+    def __getitem__(self, key: str) -> Any:
+        return self._env[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._env)
+
+    def __len__(self) -> int:
+        return len(self._env)
+
+    def digested(self) -> Dict[str, str]:
+        if self._digested is None:
+            self._digested = digest_env(self._env)
+        return self._digested
+
+    def changes(self) -> Dict[str, str]:
+        """The digested variables that differ from `os.environ`."""
+        if self._changes is None:
+            self._changes = {k: v for k, v in self.digested().items()
+                             if os.environ.get(k) != v}
+        return self._changes
+
+
+EMPTY_ENV = SharedEnv({})
+
+
 # --------------------------------------------------------------------
 @dataclass
 class OutputLine:
@@ -74,7 +133,81 @@ class InMemoryOutputSink(OutputSink):
         self._output.append(OutputLine(True, line))
 
     def output(self) -> Generator[OutputLine, None, None]:
-        yield from sorted(self._output, key=lambda x: x.when)
+        # Lines are appended as they arrive, so they're already in order.
+        yield from self._output
+
+
+# -------------------------------------------------------------------
+class SpoolOutputSink(OutputSink):
+    """
+    An output sink with bounded memory use.  Only the most recent
+    `max_lines` lines are kept in memory, older lines are appended to a
+    temporary spool file with monotonic nanosecond timestamps and are
+    streamed back from it when the output is read.  The spool file is
+    removed when the sink is garbage collected.
+    """
+
+    def __init__(self, max_lines: int = DEFAULT_SPOOL_LINES, dir: Optional[str] = None):
+        self._max_lines = max_lines
+        self._dir = dir
+        self._recent: Deque[SpooledLine] = deque()
+        self._pending: List[SpooledLine] = []
+        self._wall_origin = time.time_ns()
+        self._mono_origin = time.monotonic_ns()
+        self.spool_filename: Optional[str] = None
+        self.spooled = 0
+
+    def out(self, line):
+        self._add(False, line)
+
+    def err(self, line):
+        self._add(True, line)
+
+    def _add(self, stderr: bool, line: str):
+        self._recent.append((time.monotonic_ns(), stderr, line))
+        if len(self._recent) > self._max_lines:
+            self._pending.append(self._recent.popleft())
+            if len(self._pending) >= SPOOL_BATCH_LINES:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self.spool_filename is None:
+            fd, self.spool_filename = tempfile.mkstemp(
+                prefix="panifex-", suffix=".out", dir=self._dir)
+            os.close(fd)
+            weakref.finalize(self, _remove_quietly, self.spool_filename)
+        # Records are split on "\n" alone, as a line may contain e.g. "\r".
+        with open(self.spool_filename, "a", encoding="utf-8", errors="surrogateescape",
+                  newline="\n") as outfile:
+            outfile.writelines("%d %d %s\n" % (ns, stderr, line.replace("\n", " "))
+                               for ns, stderr, line in self._pending)
+        self.spooled += len(self._pending)
+        self._pending.clear()
+
+    def _to_output_line(self, entry: SpooledLine) -> OutputLine:
+        ns, stderr, line = entry
+        when = datetime.fromtimestamp((self._wall_origin + ns - self._mono_origin) / 1e9)
+        return OutputLine(stderr, line, when)
+
+    def output(self) -> Generator[OutputLine, None, None]:
+        self._flush()
+        if self.spool_filename is not None:
+            with open(self.spool_filename, "r", encoding="utf-8", errors="surrogateescape",
+                      newline="\n") as infile:
+                for record in infile:
+                    ns, stderr, line = record.rstrip("\n").split(" ", 2)
+                    yield self._to_output_line((int(ns), stderr == "1", line))
+        yield from (self._to_output_line(entry) for entry in list(self._recent))
+
+
+# -------------------------------------------------------------------
+def _remove_quietly(filename: str):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
 
 
 # -------------------------------------------------------------------
@@ -102,37 +235,58 @@ class OutputCollector:
 
 # -------------------------------------------------------------------
 class ShellOutputCollector:
+    """
+    Collects the output of an asyncio subprocess.  Output is read in large
+    chunks and split into lines in bulk, rather than awaiting each line
+    separately.  Lines longer than `max_line_length` bytes are broken up
+    so that a stream without newlines can't grow the buffer unbounded.
+    """
+
     # pylint/issues/1469: pylint doesn't recognize asyncio.subprocess
     # pylint: disable=E1101
-    def __init__(self):
-        self._readline_tasks: Dict[asyncio.Future[Any], ShellOutputTaskData] = {}
-
-    def _setup_readline_task(
-        self, stream: asyncio.StreamReader, sink: Callable[[str], None]
-    ):
-        if stream is not None:
-            self._readline_tasks[asyncio.Task(stream.readline())] = (stream, sink)
+    def __init__(self, chunk_size: int = COLLECT_CHUNK_SIZE,
+                 max_line_length: int = MAX_LINE_LENGTH):
+        self._chunk_size = chunk_size
+        self._max_line_length = max_line_length
 
     async def collect(self, proc: Any, sink: OutputSink):
         if not isinstance(proc, asyncio.subprocess.Process):
             raise ValueError("`proc` is not an asyncio.subprocess.Process object.")
+        streams = []
         if hasattr(proc, "stdout") and proc.stdout is not None:
-            self._setup_readline_task(proc.stdout, sink.out)
+            streams.append(self._collect_stream(proc.stdout, sink.out))
         if hasattr(proc, "stderr") and proc.stderr is not None:
-            self._setup_readline_task(proc.stderr, sink.err)
-
-        while self._readline_tasks:
-            done, pending = await asyncio.wait(
-                self._readline_tasks, return_when=asyncio.FIRST_COMPLETED
-            )
-
-            for future in done:
-                stream, sink_f = self._readline_tasks.pop(future)
-                line = future.result()
-                if line:
-                    line = decode(line).strip()
-                    sink_f(line)
-                    self._setup_readline_task(stream, sink_f)
+            streams.append(self._collect_stream(proc.stderr, sink.err))
+        await asyncio.gather(*streams)
+
+    async def _collect_stream(self, stream: asyncio.StreamReader, sink_f: LineSinkFunction):
+        buffer = bytearray()
+        while True:
+            chunk = await stream.read(self._chunk_size)
+            if not chunk:
+                break
+            buffer += chunk
+            end = buffer.rfind(b"\n")
+            if end >= 0:
+                self._emit(buffer, end, sink_f)
+                del buffer[:end + 1]
+            while len(buffer) > self._max_line_length:
+                self._emit(buffer, self._max_line_length, sink_f)
+                del buffer[:self._max_line_length]
+        if buffer:
+            self._emit(buffer, len(buffer), sink_f)
+
+    @staticmethod
+    def _emit(buffer: bytearray, end: int, sink_f: LineSinkFunction):
+        with memoryview(buffer) as view:
+            block = view[:end]
+            try:
+                lines = str(block, "utf-8").split("\n")
+            except UnicodeDecodeError:
+                lines = [decode(line) for line in bytes(block).split(b"\n")]
+            block.release()
+        for line in lines:
+            sink_f(line.strip())
 
 
 # -------------------------------------------------------------------
@@ -157,18 +311,22 @@ class ShellReport(Report):
     def succeeded(self):
         return self.returncode == 0
 
-    def generate(self):
-        return {
+    def output_lines(self) -> Iterable[OutputLine]:
+        return self.sink.output() if self.sink else ()
+
+    def generate(self, include_output: bool = True):
+        result = {
             **super().generate(),
             "cmd": self.cmd,
             "returncode": self.returncode,
-            "out": [line.json() for line in self.sink.output() if not line.stderr]
-            if self.sink
-            else [],
-            "err": [line.json() for line in self.sink.output() if line.stderr]
-            if self.sink
-            else [],
         }
+        if include_output:
+            out: List[Dict[str, Any]] = []
+            err: List[Dict[str, Any]] = []
+            for line in self.output_lines():
+                (err if line.stderr else out).append(line.json())
+            result.update(out=out, err=err)
+        return result
 
     def output(self, stdout=True, stderr=False) -> Generator[OutputLine, None, None]:
         if self.sink is None:
@@ -197,7 +355,7 @@ class ShellReport(Report):
 # --------------------------------------------------------------------
 class ShellFailed(BuildError):
     def __init__(self, report: ShellReport):
-        super().__init__(f"{report.name} failed.")
+        super().__init__(f"{report.name} failed: {report.cmd}")
         self.report = report
 
 
@@ -206,36 +364,89 @@ class ShellRecipe(FileRecipe):
     OUT = "output"
     IN = "input"
     INCLUDES = "includes"
+    DEPFILE = "depfile"
     CWD = "cwd"
-    _limiter = asyncio.BoundedSemaphore(CPU_CORES)
+    default_sink: Callable[[], OutputSink] = InMemoryOutputSink
+
+    __slots__ = ("_input", "_includes", "_output", "_depfile", "_deps", "_deps_loaded",
+                 "_cwd", "_env_base", "_env", "_params", "_name", "_sink", "_sink_factory",
+                 "_returncode", "_cmd", "_template", "_user_input", "_interactive", "_echo",
+                 "_pool", "_cacheable", "_rspfile", "_rspfile_size", "_use_shell")
 
     def __init__(self, command, **params):
         super().__init__()
+        # Generators, e.g. from Path.glob(), can only be iterated once.
+        params = freeze(params)
 
         self._input = params.get(self.IN, None)
         self._includes = params.get(self.INCLUDES, None)
         self._output = params.get(self.OUT, None)
+        self._depfile = params.get(self.DEPFILE, None)
+        self._deps: Optional[List[str]] = None
+        self._deps_loaded = False
         self._cwd = params.get(self.CWD, os.getcwd())
-        self._env = {}
+        self._env_base = EMPTY_ENV
+        self._env: Dict[str, Any] = {}
         self._params = {**params}
         self._name = "Shell Command"
         self._sink: Optional[OutputSink] = None
+        self._sink_factory: Callable[[], OutputSink] = type(self).default_sink
         self._returncode = 0
-        self._cmd = shlex.join(command) if isinstance(command, (list, tuple)) else command
+        if isinstance(command, (list, tuple)):
+            command = tuple(str(arg) for arg in command)
+        self._template = CommandTemplate.compile(command)
+        self._cmd = self._template.text
         self._user_input: Optional[str] = None
         self._interactive = False
         self._echo = True
+        self._pool: Optional[str] = None
+        self._cacheable = True
+        self._rspfile: Optional[str] = None
+        self._rspfile_size: Optional[int] = None
+        self._use_shell = True
 
     def with_env(self, env: Dict):
         self.merge_env(env)
         return self
 
+    def with_base_env(self, env: Mapping[str, Any]):
+        """
+        Use the given environment as the base environment.  A `SharedEnv`
+        is shared rather than copied, variables set with `with_env()` are
+        kept in a small overlay on top of it.
+        """
+        self._env_base = env if isinstance(env, SharedEnv) else SharedEnv(env)
+        return self
+
     def with_name(self, name: str):
         self._name = name
         return self
 
-    def with_sink(self, sink: OutputSink):
-        self._sink = sink
+    def with_sink(self, sink: Union[OutputSink, Callable[[], OutputSink]]):
+        """
+        Collect the command's output in the given sink, or in a sink made
+        by the given factory, e.g. `SpoolOutputSink`.
+        """
+        if isinstance(sink, OutputSink):
+            self._sink_factory = lambda: sink
+        else:
+            self._sink_factory = sink
+        return self
+
+    def with_pool(self, pool: str):
+        """Run this command in the named job pool, see `build.pool()`."""
+        self._pool = pool
+        return self
+
+    def with_depfile(self, depfile: Union[str, Path]):
+        """
+        Read the dependencies the command writes to the given depfile, e.g.
+        with `gcc -MD -MF {depfile}`, after each run.  Once known, they
+        replace the `includes` when deciding if the recipe is up to date.
+        """
+        self._depfile = depfile
+        self._params[self.DEPFILE] = depfile
+        return self
 
     def with_user_input(self, input: str):
         self._user_input = input
@@ -252,11 +463,17 @@ class ShellRecipe(FileRecipe):
         if not self.succeeded():
             raise ShellFailed(self.report())
 
+    def title(self) -> str:
+        if self._cmd is self._template.text:
+            # Not parsed yet, e.g. because the recipe is up to date.
+            self._cmd = self._expand_command()
+        return self._cmd
+
     def succeeded(self):
         return self.is_done() and self._returncode == 0
 
     def merge_env(self, env):
-        self._env.update(env)
+        self._env.update(freeze(env))
         return self
 
     def interactive(self):
@@ -267,14 +484,88 @@ class ShellRecipe(FileRecipe):
         self._user_input = input
         return self
 
+    def no_cache(self):
+        """Never restore this recipe's outputs from the artifact cache."""
+        self._cacheable = False
+        return self
+
+    def with_rspfile(self, param: str = IN, size: Optional[int] = None):
+        """
+        Pass the named parameter in an `@file` response file whenever the
+        command would be longer than `size` bytes, or `--rspfile-size`.
+        Only for tools that read response files, like gcc, clang, ld and ar.
+        """
+        self._rspfile = param
+        self._rspfile_size = size
+        return self
+
+    def no_shell(self):
+        """Run a command given as a list directly, without `/bin/sh`."""
+        if not self._template.is_argv():
+            raise ValueError("no_shell() needs a command given as a list.")
+        self._use_shell = False
+        return self
+
+    def _artifact_key(self) -> Optional[str]:
+        if (self.artifacts is None or not self._cacheable or self._interactive
+                or self._user_input is not None or self._db_key() is None):
+            return None
+        signature = self.signature()
+        if self._depfile is not None:
+            # The depfile's dependencies are checked against each variant
+            # in the cache instead, they may differ from the last run's.
+            signature.update(inputs=self._digest_inputs(self.input()),
+                             depfile=relative_path(self._depfile_path()))
+        return self.artifacts.key(signature)
+
+    async def _restore_artifacts(self, key: str) -> bool:
+        assert self.artifacts is not None
+        outputs = list(self._paths(self.output()))
+        if self._depfile is None:
+            manifest = await self.artifacts.fetch(key, outputs)
+        else:
+            manifest = await self.artifacts.fetch(key, outputs, self._depfile_path(),
+                                                  self.digests.digest)
+        if manifest is None:
+            return False
+        if self._depfile is not None:
+            self._deps = list(manifest["deps"])
+            self._deps_loaded = True
+        decorated_args = self._parse_command()[1]
+        if self._echo:
+            log.info(fg.blue("[cached]") + decorated_args)
+        self._sink = NullOutputSink()
+        self._returncode = 0
+        self._invalidate_outputs()
+        self.finish()
+        return True
+
     async def _resolve(self) -> Any:
-        await self._run_command(self._cmd)
+        key = self._artifact_key()
+        if key is not None and await self._restore_artifacts(key):
+            return self.output()
+
+        await self._run_command()
+
+        if key is not None and self.succeeded():
+            assert self.artifacts is not None
+            outputs = list(self._paths(self.output()))
+            if self._depfile is None:
+                self.artifacts.store(key, outputs)
+            elif self._deps is not None:
+                self.artifacts.store(key, outputs, self._depfile_path(),
+                                     self._digest_inputs(self._deps))
         return self.output()
 
-    async def _run_command(self, cmd) -> None:
-        await self._limiter.acquire()
-        try:
-            params, args, decorated_args = self._parse_command(cmd)
+    async def _run_command(self) -> None:
+        from .cas import unshare
+
+        async with self.jobs.acquire(self._pool, self.title()):
+            for path in self._paths(self.output()):
+                unshare(path)
+            if self._depfile is not None:
+                unshare(self._depfile_path())
+            args, decorated_args, params = self._parse_command(write=True)
             if self._echo:
                 log.info(fg.blue("[sh]") + decorated_args)
 
@@ -284,56 +575,139 @@ class ShellRecipe(FileRecipe):
                         "Interactive shell can't provide input programmatically."
                     )
                 self._sink = NullOutputSink()
-                self._returncode = subprocess.call(
-                    self._cmd, env=digest_env(params), cwd=self._cwd, shell=True
-                )
+                # Inherit stdio and stay in our session, so the command
+                # gets the terminal and Ctrl-C.  Other recipes keep going.
+                proc = await self._spawn(args, env=self._spawn_env(params), cwd=self._cwd)
+                try:
+                    await proc.wait()
+                except asyncio.CancelledError:
+                    if self._echo:
+                        log.info(fg.yellow("[kill]") + decorated_args)
+                    await self._terminate(proc, group=False)
+                    raise
+                self._returncode = proc.returncode
 
             else:
-                proc = await asyncio.create_subprocess_shell(
-                    self._cmd,
+                proc = await self._spawn(
+                    args,
                     stdin=asyncio.subprocess.PIPE,
                     stdout=asyncio.subprocess.PIPE,
                     stderr=asyncio.subprocess.PIPE,
-                    env=digest_env(params),
+                    env=self._spawn_env(params),
                     cwd=self._cwd,
+                    start_new_session=True,
                 )
 
-                if self._user_input is not None and proc.stdin is not None:
-                    proc.stdin.write(self._user_input.encode('utf-8'))
-                    await proc.stdin.drain()
-                    proc.stdin.close()
-
-                collector = ShellOutputCollector()
-                self._sink = InMemoryOutputSink()
-                await collector.collect(proc, self._sink)
-                await proc.wait()
+                try:
+                    if self._user_input is not None and proc.stdin is not None:
+                        proc.stdin.write(self._user_input.encode('utf-8'))
+                        await proc.stdin.drain()
+                        proc.stdin.close()
+
+                    collector = ShellOutputCollector()
+                    self._sink = self._sink_factory()
+                    await collector.collect(proc, self._sink)
+                    await proc.wait()
+                except asyncio.CancelledError:
+                    if self._echo:
+                        log.info(fg.yellow("[kill]") + decorated_args)
+                    await self._terminate(proc)
+                    raise
                 self._returncode = proc.returncode
 
+            self._read_depfile()
+            self._invalidate_outputs()
             self.finish()
             if self._echo:
                 self._print_run_report(decorated_args)
 
-        finally:
-            self._limiter.release()
-
-    def _parse_command(self, cmd):
-        params = {**self._params, **self._env}
-
-        for k, v in params.items():
-            if is_iterable(v):
-                params[k] = " ".join([shlex.quote(str(x)) for x in v])
-            else:
-                params[k] = shlex.quote(str(v))
-
-        self._cmd = cmd.format(**params)
-        args = shlex.split(self._cmd)
+    async def _spawn(self, args: List[str], **kwargs) -> asyncio.subprocess.Process:
+        if self._use_shell:
+            return await asyncio.create_subprocess_shell(self._cmd, **kwargs)
+        return await asyncio.create_subprocess_exec(*args, **kwargs)
+
+    @staticmethod
+    async def _terminate(proc: asyncio.subprocess.Process, group=True):
+        """
+        Terminate the command's process group, or just the command if not
+        `group`, killing it if it doesn't exit within `KILL_GRACE_SECONDS`.
+        """
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                if group:
+                    os.killpg(proc.pid, sig)
+                else:
+                    proc.send_signal(sig)
+            except ProcessLookupError:
+                break
+            try:
+                await asyncio.wait_for(proc.wait(), KILL_GRACE_SECONDS)
+                break
+            except asyncio.TimeoutError:
+                continue
+
+    def _lookup(self, name: str) -> Any:
+        if name in self._env:
+            return self._env[name]
+        if name in self._env_base:
+            return self._env_base[name]
+        return self._params[name]
+
+    def _template_values(self) -> Dict[str, Any]:
+        """The parameters and environment variables the template refers to."""
+        values = {}
+        for name in self._template.fields:
+            try:
+                values[name] = stable_order(self._lookup(name))
+            except KeyError:
+                raise KeyError(f"Undefined parameter in command template: {name}") from None
+        return values
+
+    def _expand_command(self) -> str:
+        return self._template.expand(self._template_values())
+
+    def _spawn_env(self, params: Optional[Mapping[str, Any]] = None) -> Dict[str, str]:
+        """
+        The command's environment: parameters, with the given overrides,
+        then the shared base, then the overlay.
+        """
+        return {
+            **digest_env({**self._params, **params} if params else self._params),
+            **self._env_base.digested(),
+            **digest_env(self._env),
+        }
 
+    def _parse_command(self, write=False) -> Tuple[List[str], str, Dict[str, Any]]:
+        """
+        Expand the command, returning its arguments, their decorated form
+        for logging and any parameters replaced by a response file, which
+        is only written if `write` is set.
+        """
+        values = self._template_values()
+        params: Dict[str, Any] = {}
+        argv = self._template.is_argv()
+        args = self._template.expand_argv(values) if argv else None
+        self._cmd = shlex.join(args) if args is not None else self._template.expand(values)
+
+        if self._rspfile is not None and self._rspfile in values:
+            size = self._rspfile_size
+            if size is None:
+                size = self.config.rspfile_size if self.config else DEFAULT_RSPFILE_SIZE
+            if len(self._cmd) > size:
+                value = values[self._rspfile]
+                content = rspfile_content(value if is_iterable(value) else [value])
+                path = write_rspfile(content) if write else rspfile_path(content)
+                params[self._rspfile] = values[self._rspfile] = f"@{path}"
+                args = self._template.expand_argv(values) if argv else None
+                self._cmd = shlex.join(args) if args is not None else self._template.expand(values)
+
+        if args is None:
+            args = shlex.split(self._cmd)
         decorated_args = f" {fg.magenta(args[0])} {shlex.join(args[1:])}"
+        return args, decorated_args, params
 
-        return params, args, decorated_args
-
-    def _run_command_sync(self, cmd):
-        params, args, decorated_args = self._parse_command(cmd)
+    def _run_command_sync(self):
+        args, decorated_args, params = self._parse_command(write=True)
         if self._echo:
             self._print_run_header(decorated_args)
 
@@ -344,12 +718,12 @@ class ShellRecipe(FileRecipe):
                 )
             self._sink = NullOutputSink()
             self._returncode = subprocess.call(
-                self._cmd, env=digest_env(params), cwd=self._cwd, shell=True
+                self._cmd, env=self._spawn_env(params), cwd=self._cwd, shell=True
             )
         else:
             proc = subprocess.Popen(
-                shlex.split(self._cmd),
-                env=digest_env(params),
+                args,
+                env=self._spawn_env(params),
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
@@ -360,6 +734,8 @@ class ShellRecipe(FileRecipe):
             self._sink = PostCommunicateOutputSink(stdout, stderr)
             self._returncode = proc.returncode
 
+        self._read_depfile()
+        self._invalidate_outputs()
         self.finish()
         if self._echo:
             self._print_run_report(decorated_args)
@@ -376,9 +752,82 @@ class ShellRecipe(FileRecipe):
             log.info(fg.white(bg.red("[!!]")) + decorated_args)
             self.report().log_output()
 
+    def _decorated_title(self) -> str:
+        return self._parse_command()[1]
+
+    def _explain_change(self, name: str, old: Any, new: Any) -> str:
+        if name == "cmd":
+            return f"the command changed, it was: {old}"
+        if name == "cwd":
+            return f"the working directory changed from {old}"
+        if name == "env":
+            old, new = old or {}, new or {}
+            changed = sorted(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+            return "the environment changed: " + ", ".join(changed)
+        return super()._explain_change(name, old, new)
+
+    def signature(self) -> Dict[str, Any]:
+        # Only variables that differ from the inherited process
+        # environment, so that e.g. a new shell session doesn't
+        # invalidate every record.
+        env = dict(self._env_base.changes())
+        for k, v in digest_env(self._env).items():
+            if os.environ.get(k) != v:
+                env[k] = v
+            else:
+                env.pop(k, None)
+        return {
+            **super().signature(),
+            "cmd": self._expand_command(),
+            "cwd": relative_path(self._cwd),
+            "env": dict(sorted(env.items())),
+        }
+
     def input(self) -> Any:
         return [self._input, self._includes]
 
+    def dependencies(self) -> Any:
+        if self._depfile is not None and not self._deps_loaded:
+            # Without a database record, fall back to the depfile left
+            # behind by the last run.
+            self._deps = self._load_depfile()
+            self._deps_loaded = True
+        if self._deps is None:
+            return self.input()
+        return [self._input, self._deps]
+
+    def _read_depfile(self):
+        if self._depfile is not None and self._returncode == 0:
+            self._deps = self._load_depfile()
+            self._deps_loaded = True
+
+    def _depfile_path(self) -> Path:
+        return Path(self._cwd) / self._depfile
+
+    def _load_depfile(self) -> Optional[List[str]]:
+        deps = read_depfile(self._depfile, self._cwd)
+        if deps is None:
+            return None
+        # Relative to the project, like the paths in `signature()`.
+        root = os.getcwd()
+        return [relative_path(dep, root) for dep in deps]
+
+    def _load_record(self, record: Dict[str, Any]):
+        if self._depfile is not None:
+            self._deps = record.get("deps")
+            self._deps_loaded = True
+
+    def _make_record(self, outputs: Dict[str, Optional[str]]) -> Dict[str, Any]:
+        record = super()._make_record(outputs)
+        if self._deps is not None:
+            record["deps"] = self._deps
+        return record
+
+    async def _clean(self, value=xeno.NOTHING) -> None:
+        await super()._clean(value)
+        if value is xeno.NOTHING and self._depfile is not None:
+            await super()._clean(self._depfile_path())
+
     def output(self) -> Any:
         return self._output
 
@@ -393,7 +842,7 @@ class ShellRecipe(FileRecipe):
         )
 
     def sync(self) -> 'ShellRecipe':
-        self._run_command_sync(self._cmd)
+        self._run_command_sync()
         return self
 
 
@@ -401,6 +850,7 @@ class ShellRecipe(FileRecipe):
 class ShellRecipeFactory:
     def __init__(self):
         self._env = {**os.environ}
+        self._shared_env: Optional[SharedEnv] = None
 
     def clone(self) -> 'ShellRecipeFactory':
         sh = ShellRecipeFactory()
@@ -409,13 +859,21 @@ class ShellRecipeFactory:
 
     def env(self, *args, **kwargs) -> Union[str, List[str]]:
         if kwargs:
-            self._env.update(kwargs)
+            self._env.update(freeze(kwargs))
+            self._shared_env = None
         if args is not None:
             if len(args) == 1:
                 return self._env[args[0]]
             return [self._env[k] for k in args]
         return {**self.env}
 
+    def batch(self, *args, **kwargs):
+        """Make a `ShellBatch` using this factory's environment."""
+        from .batch import ShellBatch
+        if self._shared_env is None:
+            self._shared_env = SharedEnv(self._env)
+        return ShellBatch(*args, env=self._shared_env, **kwargs)
+
     def __getitem__(self, name):
         return self.env(name)
 
@@ -423,9 +881,11 @@ class ShellRecipeFactory:
         self.env(**{name: value})
 
     def __call__(self, *args, **kwargs):
-        recipe = ShellRecipe(*args, **kwargs)
-        recipe.merge_env(self._env)
-        return recipe
+        # Recipes made between changes to the environment share a single
+        # read-only snapshot of it.
+        if self._shared_env is None:
+            self._shared_env = SharedEnv(self._env)
+        return ShellRecipe(*args, **kwargs).with_base_env(self._shared_env)
 
 
 # -------------------------------------------------------------------
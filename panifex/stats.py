@@ -0,0 +1,53 @@
+# --------------------------------------------------------------------
+# stats.py: A per-build cache of file status information.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import os
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+# --------------------------------------------------------------------
+PathLike = Union[str, Path]
+
+
+# --------------------------------------------------------------------
+class StatCache:
+    """
+    Caches `os.stat()` results so that each path is stat'ed at most once
+    per build, no matter how many recipes depend on it.  Recipes must
+    invalidate the paths they write.
+    """
+
+    def __init__(self):
+        self._stats: Dict[str, Optional[os.stat_result]] = {}
+
+    def stat(self, path: PathLike) -> Optional[os.stat_result]:
+        """Stat the given path, or return None if it doesn't exist."""
+        key = os.fspath(path)
+        try:
+            return self._stats[key]
+        except KeyError:
+            pass
+        try:
+            st: Optional[os.stat_result] = os.stat(key)
+        except OSError:
+            st = None
+        self._stats[key] = st
+        return st
+
+    def exists(self, path: PathLike) -> bool:
+        return self.stat(path) is not None
+
+    def mtime(self, path: PathLike) -> float:
+        st = self.stat(path)
+        return st.st_mtime if st is not None else 0
+
+    def invalidate(self, path: PathLike):
+        self._stats.pop(os.fspath(path), None)
+
+    def clear(self):
+        self._stats.clear()
@@ -0,0 +1,142 @@
+# --------------------------------------------------------------------
+# template.py: Compiled shell command templates.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import functools
+import shlex
+from string import Formatter
+from typing import Any, FrozenSet, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .util import is_iterable
+
+# --------------------------------------------------------------------
+# A literal segment, then the placeholder following it if any, with its
+# format spec and conversion, e.g. ("-o ", "output", "", None).  A
+# trailing literal has None for all three.
+Segment = Tuple[str, Optional[str], Optional[str], Optional[str]]
+_formatter = Formatter()
+# Scripts usually share a few templates across many recipes, but those
+# formatting values into the command itself have one per recipe.
+TEMPLATE_CACHE_SIZE = 1024
+
+
+# --------------------------------------------------------------------
+def _compile(template: str) -> Tuple[Segment, ...]:
+    return tuple(_formatter.parse(template))
+
+
+# --------------------------------------------------------------------
+def _field_name(field: str) -> str:
+    return field.split(".", 1)[0].split("[", 1)[0]
+
+
+# --------------------------------------------------------------------
+def _render(segments: Sequence[Segment], values: Mapping[str, Any]) -> str:
+    parts: List[str] = []
+    for literal, field, spec, conversion in segments:
+        parts.append(literal)
+        if field is None:
+            continue
+        if field in values:
+            value = values[field]
+        else:
+            value = _formatter.get_field(field, (), values)[0]
+        if conversion:
+            value = _formatter.convert_field(value, conversion)
+        parts.append(_formatter.format_field(value, spec or ""))
+    return "".join(parts)
+
+
+# --------------------------------------------------------------------
+def quote_param(value: Any) -> str:
+    """Quote a value for the shell, joining the items of iterables."""
+    if is_iterable(value):
+        return " ".join(shlex.quote(str(x)) for x in value)
+    return shlex.quote(str(value))
+
+
+# --------------------------------------------------------------------
+def join_param(value: Any) -> str:
+    if is_iterable(value):
+        return " ".join(str(x) for x in value)
+    return str(value)
+
+
+# --------------------------------------------------------------------
+class CommandTemplate:
+    """
+    A shell command template, parsed once into literal segments and the
+    `{placeholders}` between them.  Templates are cached by their text,
+    so recipes made from the same template share one.
+
+    A string template is a shell command line, its parameter values are
+    shell quoted.  A list template is an argument vector: values are
+    substituted into each argument as they are, and an argument that is
+    a single placeholder for a list expands into one argument per item.
+    """
+
+    __slots__ = ("text", "fields", "_segments", "_argv")
+
+    def __init__(self, template: Union[str, Tuple[str, ...]]):
+        if isinstance(template, str):
+            self.text = template
+            self._segments: Optional[Tuple[Segment, ...]] = _compile(template)
+            self._argv: Optional[Tuple[Tuple[Segment, ...], ...]] = None
+            segments = self._segments
+        else:
+            self.text = shlex.join(template)
+            self._segments = None
+            self._argv = tuple(_compile(arg) for arg in template)
+            segments = tuple(s for arg in self._argv for s in arg)
+        self.fields: FrozenSet[str] = frozenset(
+            _field_name(field) for _, field, _, _ in segments if field is not None)
+
+    @staticmethod
+    def compile(template: Union[str, Tuple[str, ...]]) -> "CommandTemplate":
+        return _compile_template(template)
+
+    def is_argv(self) -> bool:
+        return self._argv is not None
+
+    def _all_segments(self) -> Tuple[Segment, ...]:
+        if self._argv is not None:
+            return tuple(s for arg in self._argv for s in arg)
+        assert self._segments is not None
+        return self._segments
+
+    def occurrences(self, name: str) -> int:
+        """How many times the template refers to the named parameter."""
+        return len([field for _, field, _, _ in self._all_segments()
+                    if field is not None and _field_name(field) == name])
+
+    def expand(self, values: Mapping[str, Any]) -> str:
+        """Expand into a shell command line."""
+        if self._segments is not None:
+            return _render(self._segments, {k: quote_param(v) for k, v in values.items()})
+        return shlex.join(self.expand_argv(values))
+
+    def expand_argv(self, values: Mapping[str, Any]) -> List[str]:
+        """Expand a list template into its argument vector."""
+        if self._argv is None:
+            return shlex.split(self.expand(values))
+        args: List[str] = []
+        joined: Optional[Mapping[str, str]] = None
+        for arg in self._argv:
+            # A lone placeholder, without a spec or conversion.
+            field = arg[0][1] if len(arg) == 1 and not arg[0][0] else None
+            if (field is not None and field in values and not arg[0][2] and not arg[0][3]
+                    and is_iterable(values[field])):
+                args.extend(str(x) for x in values[field])
+                continue
+            if joined is None:
+                joined = {k: join_param(v) for k, v in values.items()}
+            args.append(_render(arg, joined))
+        return args
+
+
+# --------------------------------------------------------------------
+_compile_template = functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)(CommandTemplate)
@@ -8,13 +8,16 @@
 # --------------------------------------------------------------------
 import inspect
 import logging
+import os
 import tempfile
-from typing import Any, Dict, Optional
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Union
 from datetime import datetime
 
 import ansilog
 
 from .config import DEBUG, REPORT_DATETIME_FORMAT
+from .fileset import FileSet
 
 
 # --------------------------------------------------------------------
@@ -23,17 +26,78 @@ def format_dt(dt: Optional[datetime]):
 
 
 # --------------------------------------------------------------------
-def digest_env(env: Dict[str, Any]) -> Dict[str, str]:
+def digest_env(env: Mapping[str, Any]) -> Dict[str, str]:
+    """
+    Convert environment values to strings, joining the items of lists.
+    Generators would be consumed, see `freeze()`.
+    """
     digested: Dict[str, str] = {}
     for k, v in env.items():
+        v = stable_order(v)
         if is_iterable(v):
-            env[k] = list(v)
-            digested[k] = " ".join(v)
+            digested[k] = " ".join(str(x) for x in v)
         else:
             digested[k] = str(v)
     return digested
 
 
+# --------------------------------------------------------------------
+def freeze(values: Mapping[str, Any]) -> Dict[str, Any]:
+    """Copy the given values, turning generators into lists."""
+    return {k: list(v) if inspect.isgenerator(v) else v for k, v in values.items()}
+
+
+# --------------------------------------------------------------------
+def stable_order(value: Any) -> Any:
+    """
+    Sort sets, which are otherwise iterated in a different order from one
+    process to the next, so that they expand to the same command.
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    return value
+
+
+# --------------------------------------------------------------------
+def canonical(value: Any) -> Any:
+    """
+    A JSON-friendly form of `value` for recipe signatures.  Unlike its
+    repr(), it is the same from one build to the next: sets and mappings
+    are sorted, and functions and objects without a repr() of their own
+    are described by name and attributes instead of by address.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, os.PathLike):
+        return os.fspath(value)
+    if isinstance(value, Mapping):
+        return {str(k): canonical(v) for k, v in sorted(value.items(), key=lambda i: str(i[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted((canonical(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple, range, FileSet)):
+        return [canonical(v) for v in value]
+    if inspect.isfunction(value) or inspect.isclass(value) or inspect.isbuiltin(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    if type(value).__repr__ is object.__repr__ and hasattr(value, "__dict__"):
+        return {"type": canonical(type(value)), "attrs": canonical(vars(value))}
+    return repr(value)
+
+
+# --------------------------------------------------------------------
+def relative_path(path: Union[str, Path], root: Optional[str] = None) -> str:
+    """
+    Make an absolute path inside `root`, by default the working directory
+    the build runs in, relative to it.  Other paths are left as they are.
+    """
+    path = os.fspath(path)
+    if not os.path.isabs(path):
+        return path
+    rel = os.path.relpath(path, root or os.getcwd())
+    if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+        return path
+    return rel
+
+
 # --------------------------------------------------------------------
 def get_logger(name: str) -> logging.Logger:
     logger = ansilog.getLogger(name)
@@ -45,7 +109,7 @@ def get_logger(name: str) -> logging.Logger:
 
 # --------------------------------------------------------------------
 def is_iterable(x: Any) -> bool:
-    return isinstance(x, (list, tuple, range)) or inspect.isgenerator(x)
+    return isinstance(x, (list, tuple, range, FileSet)) or inspect.isgenerator(x)
 
 
 # --------------------------------------------------------------------
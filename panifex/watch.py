@@ -0,0 +1,305 @@
+# --------------------------------------------------------------------
+# watch.py: File watchers for rebuilding when inputs change.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .fileset import FileSet
+
+# --------------------------------------------------------------------
+DEBOUNCE_SECONDS = 0.2
+POLL_INTERVAL = 0.5
+
+# From <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 1 << 16
+
+
+# --------------------------------------------------------------------
+class WatchSet:
+    """
+    The inputs to watch: files, directories, whose whole contents are
+    watched, and FileSets, which also match files that don't exist yet.
+    """
+
+    def __init__(self, inputs: Iterable[Union[Path, FileSet]] = ()):
+        self.files: Set[Path] = set()
+        self.trees: Set[Path] = set()
+        self.filesets: List[FileSet] = []
+        self.update(inputs)
+
+    def update(self, inputs: Iterable[Union[Path, FileSet]]):
+        for value in inputs:
+            if isinstance(value, FileSet):
+                self.filesets.append(value)
+                continue
+            path = Path(os.path.abspath(value))
+            if os.path.isdir(path):
+                self.trees.add(path)
+            else:
+                self.files.add(path)
+
+    def __len__(self) -> int:
+        return len(self.files) + len(self.trees) + len(self.filesets)
+
+    def directories(self) -> Dict[Path, bool]:
+        """The directories to watch, and whether to watch their subdirectories."""
+        dirs = {path.parent: False for path in self.files}
+        for fileset in self.filesets:
+            base, recursive = fileset.base()
+            dirs[base] = dirs.get(base, False) or recursive
+        dirs.update((tree, True) for tree in self.trees)
+        return dirs
+
+    def matches(self, path: Path) -> bool:
+        """Whether a change to the given absolute path affects the inputs."""
+        if path in self.files or path in self.trees:
+            return True
+        if any(parent in self.trees for parent in path.parents):
+            return True
+        return any(fileset.matches(path) for fileset in self.filesets)
+
+    def paths(self) -> Set[Path]:
+        """All watched paths that exist, e.g. to treat them all as changed."""
+        return {*self.files, *self.trees,
+                *(Path(os.path.abspath(p)) for fileset in self.filesets for p in fileset)}
+
+
+# --------------------------------------------------------------------
+def _walk_dirs(root: Path) -> Iterator[Path]:
+    """The given directory and those below it, without following symlinks."""
+    for directory, _, _ in os.walk(root):
+        yield Path(directory)
+
+
+# --------------------------------------------------------------------
+class Watcher:
+    """
+    Waits for changes to a set of inputs.  Bursts of changes, like a
+    `git checkout` or an editor's save dance, are debounced into a single
+    set of changed paths.
+    """
+
+    def __init__(self):
+        self._watched = WatchSet()
+
+    @staticmethod
+    def create() -> "Watcher":
+        """Create an inotify watcher, or a polling watcher if that fails."""
+        try:
+            return InotifyWatcher()
+        except OSError:
+            return PollingWatcher()
+
+    def watch(self, watched: WatchSet):
+        """
+        Watch exactly the given inputs from now on.  Changes that happened
+        before this call, e.g. during a build, are discarded.
+        """
+        self._watched = watched
+
+    def wait(self) -> Set[Path]:
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+# --------------------------------------------------------------------
+class InotifyWatcher(Watcher):
+    """
+    Watches the directories containing the watched inputs via inotify.
+    Directories created inside a recursively watched directory are
+    watched as soon as they appear.
+    """
+
+    def __init__(self):
+        super().__init__()
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        try:
+            self._add_watch = libc.inotify_add_watch
+            self._rm_watch = libc.inotify_rm_watch
+            init = libc.inotify_init1
+        except AttributeError as e:
+            raise OSError(errno.ENOSYS, "inotify is not available.") from e
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1() failed.")
+        self._dirs: Dict[int, Path] = {}
+        self._wds: Dict[Path, int] = {}
+        self._recursive: Set[int] = set()
+
+    def watch(self, watched: WatchSet):
+        super().watch(watched)
+        wanted: Dict[Path, bool] = {}
+        for directory, recursive in watched.directories().items():
+            if recursive:
+                wanted.update((d, True) for d in _walk_dirs(directory))
+            else:
+                wanted.setdefault(directory, False)
+        for directory in set(self._wds) - set(wanted):
+            wd = self._wds[directory]
+            self._rm_watch(self._fd, wd)
+            self._forget(wd)
+        for directory, recursive in wanted.items():
+            self._add(directory, recursive)
+        self._read_events()
+
+    def _add(self, directory: Path, recursive: bool) -> bool:
+        wd = self._wds.get(directory)
+        if wd is None:
+            wd = self._add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                return False
+            self._wds[directory] = wd
+            self._dirs[wd] = directory
+        if recursive:
+            self._recursive.add(wd)
+        else:
+            self._recursive.discard(wd)
+        return True
+
+    def _forget(self, wd: int):
+        directory = self._dirs.pop(wd, None)
+        if directory is not None and self._wds.get(directory) == wd:
+            del self._wds[directory]
+        self._recursive.discard(wd)
+
+    def _add_tree(self, root: Path) -> Set[Path]:
+        """
+        Watch a new directory and those below it, returning what they
+        already contain, as it may have been created before the watch.
+        """
+        found: Set[Path] = set()
+        for directory, _, files in os.walk(root):
+            if self._add(Path(directory), True):
+                found.update(Path(directory, name) for name in files)
+        return found
+
+    def _read_events(self) -> Tuple[Set[Path], bool]:
+        changed: Set[Path] = set()
+        overflowed = False
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    overflowed = True
+                elif mask & IN_IGNORED:
+                    # The directory was deleted, it's watched again if it
+                    # is created again.
+                    self._forget(wd)
+                elif wd in self._dirs and name:
+                    path = self._dirs[wd] / os.fsdecode(name)
+                    changed.add(path)
+                    if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+                            and wd in self._recursive):
+                        changed.update(self._add_tree(path))
+        return changed, overflowed
+
+    def wait(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        timeout: Optional[float] = None
+        while True:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            if not ready:
+                if changed:
+                    return changed
+                continue
+            events, overflowed = self._read_events()
+            if overflowed:
+                events = self._watched.paths()
+            changed.update(p for p in events if self._watched.matches(p))
+            if changed:
+                timeout = DEBOUNCE_SECONDS
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+# --------------------------------------------------------------------
+class PollingWatcher(Watcher):
+    """
+    Periodically stats the files in the watched directories, where
+    inotify isn't available.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._snapshot: Dict[Path, Optional[Tuple[int, int]]] = {}
+
+    def _take_snapshot(self) -> Dict[Path, Optional[Tuple[int, int]]]:
+        snapshot: Dict[Path, Optional[Tuple[int, int]]] = {}
+        for path in self._watched.files:
+            snapshot[path] = None
+        for directory, recursive in self._watched.directories().items():
+            for subdir in (_walk_dirs(directory) if recursive else [directory]):
+                try:
+                    with os.scandir(subdir) as entries:
+                        for entry in entries:
+                            try:
+                                st = entry.stat()
+                                snapshot[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+                            except OSError:
+                                pass
+                except OSError:
+                    pass
+        return snapshot
+
+    def watch(self, watched: WatchSet):
+        super().watch(watched)
+        self._snapshot = self._take_snapshot()
+
+    def wait(self) -> Set[Path]:
+        changed: Set[Path] = set()
+        while True:
+            time.sleep(DEBOUNCE_SECONDS if changed else POLL_INTERVAL)
+            snapshot = self._take_snapshot()
+            news = {p for p in {*snapshot, *self._snapshot}
+                    if self._snapshot.get(p) != snapshot.get(p) and self._watched.matches(p)}
+            self._snapshot = snapshot
+            if not news and changed:
+                return changed
+            changed.update(news)
@@ -0,0 +1,79 @@
+# --------------------------------------------------------------------
+# conftest.py: Fixtures for running bake scripts in a scratch directory.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+from typing import Callable, Dict
+
+import pytest
+
+# --------------------------------------------------------------------
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# --------------------------------------------------------------------
+class Bake:
+    """A bake script in its own directory, run in a fresh interpreter."""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def write(self, script: str):
+        (self.path / "bake.py").write_text(textwrap.dedent(script))
+
+    def run(self, *args: str, timeout: float = 60) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, "bake.py", *args], cwd=self.path, env=self._env(),
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                              timeout=timeout)
+
+    def start(self, *args: str) -> subprocess.Popen:
+        """Start the script in the background, e.g. in watch mode."""
+        return subprocess.Popen([sys.executable, "bake.py", *args], cwd=self.path,
+                                env=self._env(), stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True)
+
+    def _env(self) -> Dict[str, str]:
+        return {**os.environ, "PYTHONPATH": str(ROOT)}
+
+
+# --------------------------------------------------------------------
+@pytest.fixture
+def bake(tmp_path: Path) -> Bake:
+    return Bake(tmp_path)
+
+
+# --------------------------------------------------------------------
+@pytest.fixture
+def checkout(tmp_path: Path) -> Callable[[str], Bake]:
+    """Make bake scripts in named subdirectories, like separate checkouts."""
+
+    def make(name: str) -> Bake:
+        path = tmp_path / name
+        path.mkdir()
+        return Bake(path)
+
+    return make
+
+
+# --------------------------------------------------------------------
+@pytest.fixture
+def deep_headers(tmp_path: Path) -> Path:
+    """64 sources in `src`, and 256 headers four levels below `deep`."""
+    (tmp_path / "src").mkdir()
+    for n in range(64):
+        (tmp_path / "src" / f"f{n}.c").write_text(f"{n}\n")
+    for a in range(8):
+        for b in range(8):
+            directory = tmp_path / "deep" / f"d{a}" / f"e{b}"
+            directory.mkdir(parents=True)
+            for k in range(4):
+                (directory / f"h{k}.h").write_text("h\n")
+    return tmp_path
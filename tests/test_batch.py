@@ -0,0 +1,47 @@
+# --------------------------------------------------------------------
+# test_batch.py: Tests for shell commands run once for many inputs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+# --------------------------------------------------------------------
+# Like `cc -c`, the command "compiles" every input it can and fails if
+# any of them can't be.
+COMPILE = """
+    from panifex import build, sh, default
+
+    @default
+    def objects():
+        compile = sh.batch("status=0; for f in {input}; do "
+                           "if grep -q bad $f; then status=1; else cp $f $(basename $f .c).o; fi; "
+                           "done; exit $status")
+        return [compile(input=f"{name}.c", output=f"{name}.o") for name in ("a", "b", "c")]
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def test_failed_batch_maps_results_to_members(bake):
+    bake.write(COMPILE)
+    for name in ("a", "b", "c"):
+        (bake.path / f"{name}.c").write_text(f"{name}\n")
+    (bake.path / "b.c").write_text("bad\n")
+
+    result = bake.run("-k")
+    assert result.returncode == 1, result.stdout
+    assert "b.c" in result.stdout and "and 1 more" not in result.stdout
+    assert (bake.path / "a.o").exists()
+    assert not (bake.path / "b.o").exists()
+    assert (bake.path / "c.o").exists()
+
+    # Only the failed member runs again.
+    (bake.path / "b.c").write_text("b\n")
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+    assert "b.c" in result.stdout
+    assert "a.c" not in result.stdout and "c.c" not in result.stdout
+    assert (bake.path / "b.o").read_text() == "b\n"
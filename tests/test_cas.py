@@ -0,0 +1,74 @@
+# --------------------------------------------------------------------
+# test_cas.py: Tests for restoring outputs from the artifact cache.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+# --------------------------------------------------------------------
+# Like `gcc -MD`, the command includes the header named in `b.c` and
+# lists it in its depfile.
+INCLUDE = """
+    from panifex import build, sh, default
+
+    @default
+    def include():
+        return sh("cat $(cat {input}) > {output} && echo '{output}: {input}' $(cat {input}) > {depfile}",
+                  input="b.c", output="b.i", depfile="b.d")
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def test_depfile_variants(bake):
+    bake.write(INCLUDE)
+    (bake.path / "y.h").write_text("int y1;\n")
+    (bake.path / "z.h").write_text("int z1;\n")
+
+    def include(header: str, expected: str) -> str:
+        (bake.path / "b.c").write_text(header + "\n")
+        result = bake.run("--cas", str(bake.path / "cas"))
+        assert result.returncode == 0, result.stdout
+        assert (bake.path / "b.i").read_text() == expected
+        assert header in (bake.path / "b.d").read_text()
+        return result.stdout
+
+    assert "[sh]" in include("y.h", "int y1;\n")
+    assert "[sh]" in include("z.h", "int z1;\n")
+    assert "[cached]" in include("y.h", "int y1;\n")
+
+    # The cached variant for z.h depends on its old content.
+    (bake.path / "z.h").write_text("int z2;\n")
+    assert "[sh]" in include("z.h", "int z2;\n")
+    output = include("z.h", "int z2;\n")
+    assert "[sh]" not in output and "[cached]" not in output
+
+    # The depfile is restored along with the output.
+    (bake.path / "b.i").unlink()
+    (bake.path / "b.d").unlink()
+    assert "[cached]" in include("z.h", "int z2;\n")
+    (bake.path / "z.h").write_text("int z3;\n")
+    assert "[sh]" in include("z.h", "int z3;\n")
+
+
+# --------------------------------------------------------------------
+def test_eviction_keeps_cache_within_size(bake):
+    bake.write("""
+        from panifex import build, sh, default
+
+        @default
+        def blobs():
+            return [sh("head -c 700000 /dev/zero > {output}", output=f"blob{n}.bin")
+                    for n in range(3)]
+
+        build()
+    """)
+    result = bake.run("--cas", str(bake.path / "cas"), "--cas-size", "1")
+    assert result.returncode == 0, result.stdout
+    assert "3 stored" in result.stdout
+
+    entries = list((bake.path / "cas").glob("*/*/manifest.json"))
+    assert len(entries) == 1
@@ -0,0 +1,78 @@
+# --------------------------------------------------------------------
+# test_clean.py: Tests for deleting recipe outputs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+# --------------------------------------------------------------------
+OUTPUTS = """
+    from panifex import build, sh, default, target
+
+    @target
+    def notes():
+        return [sh("echo {n} > {output}", n=n, output=f"note{n}.txt") for n in range(2)]
+
+    @target
+    def site():
+        return sh("mkdir -p {output}/css && touch {output}/index.html {output}/css/main.css",
+                  output="site")
+
+    @default
+    def all(notes, site):
+        pass
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def test_clean_deletes_outputs_in_one_batch(bake):
+    bake.write(OUTPUTS)
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+    assert (bake.path / "site" / "css" / "main.css").exists()
+
+    result = bake.run("-c")
+    assert result.returncode == 0, result.stdout
+    assert "2 file(s) and 1 directory(s)" in result.stdout
+    assert result.stdout.count("deleted") == 1
+    assert not (bake.path / "note0.txt").exists()
+    assert not (bake.path / "note1.txt").exists()
+    assert not (bake.path / "site").exists()
+
+
+# --------------------------------------------------------------------
+def test_clean_dry_run_lists_outputs(bake):
+    bake.write(OUTPUTS)
+    assert bake.run().returncode == 0
+
+    result = bake.run("-c", "-n")
+    assert result.returncode == 0, result.stdout
+    assert str(bake.path / "note0.txt") in result.stdout
+    assert str(bake.path / "site") in result.stdout
+    assert (bake.path / "note0.txt").exists()
+    assert (bake.path / "site").exists()
+
+
+# --------------------------------------------------------------------
+def test_clean_outside_a_clean_build_deletes_now(bake):
+    bake.write("""
+        import os
+        from panifex import build, sh, default
+
+        @default
+        async def scratch():
+            recipe = sh("echo scratch > {output}", output="scratch.txt")
+            await recipe.make()
+            assert os.path.exists("scratch.txt")
+            await recipe.clean()
+            assert not os.path.exists("scratch.txt")
+
+        build()
+    """)
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+    assert not (bake.path / "scratch.txt").exists()
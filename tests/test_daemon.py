@@ -0,0 +1,78 @@
+# --------------------------------------------------------------------
+# test_daemon.py: Tests for the resident build server.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import ROOT
+
+# --------------------------------------------------------------------
+SCRIPT = """
+    import os
+    from panifex import build, default
+
+    @default
+    def pid():
+        print("PID", os.getpid())
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def _bake(cwd, *args, **env):
+    # Pytest sets this to the current test, and its phase.
+    inherited = {k: v for k, v in os.environ.items() if k != "PYTEST_CURRENT_TEST"}
+    env = {**inherited, "PYTHONPATH": str(ROOT), "PWD": str(cwd), **env}
+    return [sys.executable, "-m", "panifex.bake", *args], dict(cwd=cwd, env=env)
+
+
+# --------------------------------------------------------------------
+@pytest.fixture
+def server(bake):
+    bake.write(SCRIPT)
+    args, kwargs = _bake(bake.path, "--daemon", TERM="xterm")
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            **kwargs)
+    try:
+        deadline = time.monotonic() + 30
+        while not (bake.path / ".panifex" / "daemon.sock").exists():
+            assert proc.poll() is None and time.monotonic() < deadline
+            time.sleep(0.05)
+        yield proc
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+# --------------------------------------------------------------------
+def _run(cwd, **env) -> subprocess.CompletedProcess:
+    args, kwargs = _bake(cwd, **env)
+    return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                          timeout=60, **kwargs)
+
+
+# --------------------------------------------------------------------
+def test_served_from_subdirectory(bake, server):
+    subdir = bake.path / "src" / "lib"
+    subdir.mkdir(parents=True)
+    result = _run(subdir, TERM="screen-256color", SSH_TTY="/dev/pts/7")
+    assert result.returncode == 0, result.stdout
+    assert f"PID {server.pid}" in result.stdout, result.stdout
+
+
+# --------------------------------------------------------------------
+def test_refused_when_environment_differs(bake, server):
+    result = _run(bake.path, TERM="xterm", PANIFEX_TEST_VARIABLE="1")
+    assert result.returncode == 0, result.stdout
+    assert "environment differs: PANIFEX_TEST_VARIABLE" in result.stdout
+    assert f"PID {server.pid}" not in result.stdout
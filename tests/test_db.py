@@ -0,0 +1,88 @@
+# --------------------------------------------------------------------
+# test_db.py: Tests for deciding rebuilds from the build database.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import json
+
+import pytest
+
+# --------------------------------------------------------------------
+LISTING = """
+    from panifex import build, sh, default
+
+    @default
+    def listing():
+        return sh("ls {input} > {output} && cat {input}/* >> {output}",
+                  input="assets", output="listing.txt")
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+@pytest.mark.parametrize("cas", [False, True])
+def test_directory_input(bake, cas):
+    args = ["--cas", str(bake.path / "cas")] if cas else []
+    bake.write(LISTING)
+    assets = bake.path / "assets"
+    assets.mkdir()
+    (assets / "a.txt").write_text("first\n")
+
+    def listing():
+        result = bake.run(*args)
+        assert result.returncode == 0, result.stdout
+        return (bake.path / "listing.txt").read_text().split()
+
+    assert listing() == ["a.txt", "first"]
+    assert "[sh]" not in bake.run(*args).stdout
+
+    # A new file, and a changed one.
+    (assets / "b.txt").write_text("second\n")
+    assert listing() == ["a.txt", "b.txt", "first", "second"]
+    (assets / "b.txt").write_text("third\n")
+    assert listing() == ["a.txt", "b.txt", "first", "third"]
+
+
+# --------------------------------------------------------------------
+def test_concurrent_builds_save_whole_databases(bake):
+    bake.write("""
+        from panifex import build, sh, default
+
+        @default
+        def notes():
+            return [sh("echo {n} > {output}", n=n, output=f"note{n}.txt") for n in range(20)]
+
+        build()
+    """)
+    builds = [bake.start("--db", ".panifex/db") for _ in range(4)]
+    for proc in builds:
+        output, _ = proc.communicate(timeout=60)
+        assert proc.returncode == 0, output
+
+    # The last build to save wins, but its database is whole and no
+    # temporaries are left behind.
+    db = bake.path / ".panifex"
+    assert [p.name for p in db.iterdir()] == ["db"]
+    assert json.loads((db / "db").read_text())["records"]
+
+
+# --------------------------------------------------------------------
+def test_set_parameters_expand_in_a_stable_order(bake):
+    bake.write("""
+        from panifex import build, sh, default
+
+        @default
+        def tags():
+            return sh("echo {names} > {output}", names={"alpha", "beta", "gamma", "delta"},
+                      output="tags.txt")
+
+        build()
+    """)
+    assert bake.run().returncode == 0
+    assert (bake.path / "tags.txt").read_text() == "alpha beta delta gamma\n"
+    for _ in range(3):
+        assert "[sh]" not in bake.run().stdout
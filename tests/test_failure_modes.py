@@ -0,0 +1,164 @@
+# --------------------------------------------------------------------
+# test_failure_modes.py: Tests for what a build does after a failure.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import time
+
+# --------------------------------------------------------------------
+# `bad` fails while `slow` is still running.  `after` only starts once
+# `slow` is done, i.e. after the failure, and doesn't depend on `bad`.
+BRANCHES = """
+    from panifex import build, sh, default, target
+
+    @target
+    def bad():
+        return sh("sleep 0.2; false")
+
+    @target
+    def slow():
+        return sh("sleep 1; echo slow > {output}", output="slow.out")
+
+    @target
+    def after(slow):
+        return sh("echo after > {output}", output="after.out")
+
+    @target
+    def downstream(bad):
+        return sh("echo downstream > {output}", output="downstream.out")
+
+    @default
+    def all(after, downstream):
+        pass
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def _running(pid: int, timeout: float = 2) -> bool:
+    """
+    Whether the process is still running after `timeout` seconds.  An
+    orphaned command is reaped by init, so it may linger as a zombie.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with open(f"/proc/{pid}/stat") as infile:
+                state = infile.read().rsplit(")", 1)[1].split()[0]
+        except FileNotFoundError:
+            return False
+        if state == "Z" or time.monotonic() > deadline:
+            return state != "Z"
+        time.sleep(0.05)
+
+
+# --------------------------------------------------------------------
+def test_fail_fast_kills_running_commands(bake):
+    bake.write("""
+        from panifex import build, sh, default, target
+
+        @target
+        def slow():
+            return sh("sleep 30 & echo $! > sleep.pid; wait; echo slow > {output}",
+                      output="slow.out")
+
+        @target
+        def bad():
+            return sh("sleep 0.5; false")
+
+        @default
+        def all(slow, bad):
+            pass
+
+        build()
+    """)
+    started = time.monotonic()
+    result = bake.run("--fail-fast", "-j", "2")
+    assert result.returncode == 1, result.stdout
+    assert time.monotonic() - started < 15
+
+    pid = int((bake.path / "sleep.pid").read_text())
+    assert not _running(pid)
+    assert not (bake.path / "slow.out").exists()
+
+
+# --------------------------------------------------------------------
+def test_keep_going_builds_independent_branch(bake):
+    bake.write(BRANCHES)
+    result = bake.run("-k", "-j", "2")
+    assert result.returncode == 1, result.stdout
+    assert (bake.path / "slow.out").exists()
+    assert (bake.path / "after.out").exists()
+    assert not (bake.path / "downstream.out").exists()
+
+
+# --------------------------------------------------------------------
+def test_default_finishes_running_jobs_only(bake):
+    bake.write(BRANCHES)
+    result = bake.run("-j", "2")
+    assert result.returncode == 1, result.stdout
+    assert (bake.path / "slow.out").exists()
+    assert not (bake.path / "after.out").exists()
+    assert not (bake.path / "downstream.out").exists()
+
+
+# --------------------------------------------------------------------
+def test_caught_failure_is_not_a_build_failure(bake):
+    bake.write("""
+        from panifex import build, sh, default, target
+        from panifex.shell import ShellFailed
+
+        @target
+        async def probe():
+            try:
+                await sh("false").make()
+            except ShellFailed:
+                return "fallback"
+            return "found"
+
+        @default
+        def result(probe):
+            return sh("echo {probe} > {output}", probe=probe, output="result.out")
+
+        build()
+    """)
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+    assert "FAIL" not in result.stdout
+    assert (bake.path / "result.out").read_text().strip() == "fallback"
+
+
+# --------------------------------------------------------------------
+def test_fail_fast_kills_running_batches(bake):
+    bake.write("""
+        from panifex import build, sh, default, target
+
+        @target
+        def lint():
+            check = sh.batch("sleep 30 & echo $! > sleep.pid; wait; cat {input}")
+            return [check(input=name, stamp=name + ".ok") for name in ("a.txt", "b.txt")]
+
+        @target
+        def bad():
+            return sh("sleep 0.5; false")
+
+        @default
+        def all(lint, bad):
+            pass
+
+        build()
+    """)
+    (bake.path / "a.txt").write_text("a\n")
+    (bake.path / "b.txt").write_text("b\n")
+    started = time.monotonic()
+    result = bake.run("--fail-fast", "-j", "2")
+    assert result.returncode == 1, result.stdout
+    assert time.monotonic() - started < 15
+
+    pid = int((bake.path / "sleep.pid").read_text())
+    assert not _running(pid)
+    assert not (bake.path / "a.txt.ok").exists()
@@ -0,0 +1,70 @@
+# --------------------------------------------------------------------
+# test_fileset.py: Tests for lazily evaluated file globs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import glob
+import threading
+
+from panifex import fileset
+from panifex.fileset import FileSet
+
+
+# --------------------------------------------------------------------
+def test_matches_glob(deep_headers, monkeypatch):
+    monkeypatch.chdir(deep_headers)
+    expected = sorted(glob.glob("deep/**/*.h", recursive=True))
+    assert [str(p) for p in FileSet("deep/**/*.h")] == expected
+
+
+# --------------------------------------------------------------------
+def test_iterated_from_many_threads(deep_headers, monkeypatch):
+    monkeypatch.chdir(deep_headers)
+    counts, errors = [], []
+
+    for _ in range(20):
+        fileset._scans.clear()
+        files = FileSet("deep/**/*.h")
+        barrier = threading.Barrier(8)
+
+        def count():
+            barrier.wait()
+            try:
+                counts.append(sum(1 for _ in files))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert set(counts) == {256}
+
+
+# --------------------------------------------------------------------
+def test_shared_includes_rebuild(bake, deep_headers):
+    # Up to date recipes check their shared includes on worker threads.
+    bake.write("""
+        from panifex import build, sh, default, FileSet
+
+        @default
+        def objects():
+            includes = FileSet("deep/**/*.h")
+            return [sh("cat {input} > {output}", input=f"src/f{n}.c", output=f"src/f{n}.o",
+                       includes=includes) for n in range(64)]
+
+        build()
+    """)
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+
+    for _ in range(5):
+        result = bake.run()
+        assert result.returncode == 0, result.stdout
+        assert "[sh]" not in result.stdout
@@ -0,0 +1,32 @@
+# --------------------------------------------------------------------
+# test_imports.py: Tests for keeping optional modules out of quick runs.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+
+# --------------------------------------------------------------------
+def test_listing_targets_skips_optional_modules(bake):
+    bake.write("""
+        import sys
+        from panifex import build, sh, default
+
+        @default
+        def hello():
+            "Say hello."
+            return sh("echo hello")
+
+        build()
+        print("loaded:", *sorted(m for m in sys.modules if m.startswith("panifex.")))
+    """)
+    result = bake.run("-l")
+    assert result.returncode == 0, result.stdout
+    assert "Say hello." in result.stdout
+
+    loaded = result.stdout.split("loaded:", 1)[1].split()
+    assert "panifex.build" in loaded
+    for name in ("batch", "cas", "daemon", "profile", "python", "remote", "watch"):
+        assert f"panifex.{name}" not in loaded
@@ -0,0 +1,49 @@
+# --------------------------------------------------------------------
+# test_interactive.py: Tests for builds running interactive commands.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+# --------------------------------------------------------------------
+# `prompt` fails unless `quick` finished while it was running.  `quick`
+# waits for 64 recipes, which check their shared includes on worker
+# threads once they're up to date.
+SCRIPT = """
+    from panifex import build, sh, default, target, FileSet
+
+    @target
+    def objects():
+        includes = FileSet("deep/**/*.h")
+        return [sh("cat {input} > {output}", input=f"src/f{n}.c", output=f"src/f{n}.o",
+                   includes=includes) for n in range(64)]
+
+    @target
+    def quick(objects):
+        return sh("echo quick > {output}", output="quick.out")
+
+    @target
+    def prompt():
+        return sh("sleep 2; test -f quick.out").interactive()
+
+    @default
+    def all(prompt, quick):
+        pass
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def test_jobs_progress_during_interactive_command(bake, deep_headers):
+    bake.write(SCRIPT)
+    result = bake.run("-j", "4")
+    assert result.returncode == 0, result.stdout
+
+    for _ in range(3):
+        (bake.path / "quick.out").unlink()
+        result = bake.run("-j", "4")
+        assert result.returncode == 0, result.stdout
+        assert "cat" not in result.stdout
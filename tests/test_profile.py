@@ -0,0 +1,47 @@
+# --------------------------------------------------------------------
+# test_profile.py: Tests for the build profiler's trace output.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import json
+
+# --------------------------------------------------------------------
+SCRIPT = """
+    from panifex import build, sh, default, target
+
+    @target
+    def copy():
+        return sh("cat {input} > {output}", input="a.txt", output="b.txt")
+
+    @target
+    def lint():
+        check = sh.batch("cat {input}")
+        return [check(input="a.txt", stamp="a.txt.ok")]
+
+    @default
+    def all(copy, lint):
+        pass
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def test_skipped_recipes_named_by_expanded_command(bake):
+    bake.write(SCRIPT)
+    (bake.path / "a.txt").write_text("a\n")
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+
+    # Both recipes are up to date, so their commands are never run.
+    result = bake.run("--profile", "profile.json")
+    assert result.returncode == 0, result.stdout
+    with open(bake.path / "profile.json") as infile:
+        events = json.load(infile)["traceEvents"]
+    names = {e["name"] for e in events if e.get("cat") == "recipe"}
+    assert "cat a.txt > b.txt" in names
+    assert "cat a.txt" in names
+    assert not any("{" in name for name in names)
@@ -0,0 +1,127 @@
+# --------------------------------------------------------------------
+# test_python.py: Tests for Python function recipes made with @cpu.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import os
+
+# --------------------------------------------------------------------
+SQUARES = """
+    import os
+    from panifex import build, cpu, default
+
+    OFFSET = {offset}
+
+    @cpu
+    def square(n, offset, output):
+        with open(output, "w") as outfile:
+            outfile.write(f"{{n * n + offset}} {{os.getppid()}}")
+
+    @default
+    def squares():
+        return [square(n, OFFSET, output=f"square{{n}}.txt") for n in range(4)]
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def _squares(bake):
+    results = [(bake.path / f"square{n}.txt").read_text().split() for n in range(4)]
+    return [int(value) for value, _ in results], {int(ppid) for _, ppid in results}
+
+
+# --------------------------------------------------------------------
+def test_calls_run_in_worker_processes(bake):
+    bake.write(SQUARES.format(offset=0))
+    result = bake.run("-j", "2")
+    assert result.returncode == 0, result.stdout
+    assert result.stdout.count("[py]") == 4
+
+    values, parents = _squares(bake)
+    assert values == [0, 1, 4, 9]
+    # Workers are children of the build, not of the test.
+    assert os.getpid() not in parents
+
+    result = bake.run("-j", "2")
+    assert result.returncode == 0, result.stdout
+    assert "[py]" not in result.stdout
+
+
+# --------------------------------------------------------------------
+def test_explain_changed_arguments(bake):
+    bake.write(SQUARES.format(offset=0))
+    assert bake.run().returncode == 0
+
+    result = bake.run("--explain")
+    assert result.returncode == 0, result.stdout
+    assert "[why]" not in result.stdout
+
+    bake.write(SQUARES.format(offset=1))
+    result = bake.run("--explain")
+    assert result.returncode == 0, result.stdout
+    assert result.stdout.count("the arguments changed") == 4
+    assert _squares(bake)[0] == [1, 2, 5, 10]
+
+
+# --------------------------------------------------------------------
+def test_signature_is_stable_across_builds(bake):
+    bake.write("""
+        from panifex import build, cpu, default
+
+        class Options:
+            def __init__(self, level):
+                self.level = level
+
+        @cpu
+        def tags(names, options, output):
+            with open(output, "w") as outfile:
+                outfile.write(" ".join(sorted(names)) + f" {options.level}")
+
+        @default
+        def tagged():
+            return tags({"alpha", "beta", "gamma", "delta"}, Options(2), output="tags.txt")
+
+        build()
+    """)
+    assert bake.run().returncode == 0
+    assert (bake.path / "tags.txt").read_text() == "alpha beta delta gamma 2"
+
+    # Sets and objects without a repr() of their own are hashed by value.
+    for _ in range(3):
+        result = bake.run("--explain")
+        assert result.returncode == 0, result.stdout
+        assert "[py]" not in result.stdout
+
+
+# --------------------------------------------------------------------
+def test_calls_take_job_pool_slots(bake):
+    bake.write("""
+        import os
+        import time
+        from panifex import build, cpu, default, pool
+
+        pool("exclusive", 1)
+
+        @cpu
+        def exclusive(n, output):
+            # Fails if another call holds the lock.
+            os.mkdir("lock")
+            time.sleep(0.2)
+            os.rmdir("lock")
+            with open(output, "w") as outfile:
+                outfile.write(str(n))
+
+        @default
+        def calls():
+            return [exclusive(n, output=f"call{n}.txt").with_pool("exclusive")
+                    for n in range(4)]
+
+        build()
+    """)
+    result = bake.run("-j", "4")
+    assert result.returncode == 0, result.stdout
+    assert all((bake.path / f"call{n}.txt").exists() for n in range(4))
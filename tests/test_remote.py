@@ -0,0 +1,87 @@
+# --------------------------------------------------------------------
+# test_remote.py: Tests for sharing artifacts through a remote cache.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import socket
+import threading
+
+import pytest
+
+from panifex.remote import CacheServer
+
+# --------------------------------------------------------------------
+COPY = """
+    from panifex import build, sh, default
+
+    @default
+    def copy():
+        return sh("cat {input} > {output}", input="a.txt", output="b.txt")
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+@pytest.fixture
+def cache_url(tmp_path):
+    server = CacheServer(tmp_path / "server", ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%d" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+# --------------------------------------------------------------------
+def _setup(bake):
+    bake.write(COPY)
+    (bake.path / "a.txt").write_text("shared\n")
+
+
+# --------------------------------------------------------------------
+def _run(bake, url: str):
+    result = bake.run("--cas", str(bake.path / "cas"), "--remote-cache", url)
+    assert result.returncode == 0, result.stdout
+    assert (bake.path / "b.txt").read_text() == "shared\n"
+    return result.stdout
+
+
+# --------------------------------------------------------------------
+def test_restored_in_another_checkout(checkout, cache_url):
+    first, second = checkout("first"), checkout("second")
+    _setup(first)
+    _setup(second)
+
+    output = _run(first, cache_url)
+    assert "[sh]" in output
+    assert "1 uploaded" in output
+
+    output = _run(second, cache_url)
+    assert "[sh]" not in output
+    assert "[cached]" in output
+    assert "1 remote hits" in output
+
+
+# --------------------------------------------------------------------
+def test_missing_entry_runs_command(bake, cache_url):
+    _setup(bake)
+    output = _run(bake, cache_url)
+    assert "[sh]" in output
+    assert "0 remote hits" in output
+
+
+# --------------------------------------------------------------------
+def test_unreachable_cache_runs_command(bake):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    _setup(bake)
+    output = _run(bake, "http://127.0.0.1:%d" % port)
+    assert "[sh]" in output
+    assert "Failed to fetch artifacts from remote cache" in output
@@ -0,0 +1,72 @@
+# --------------------------------------------------------------------
+# test_reports.py: Tests for streaming JSON Lines build reports.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import json
+
+# --------------------------------------------------------------------
+GREETINGS = """
+    from panifex import build, sh, default
+
+    @default
+    def greetings():
+        return [sh("echo hello {who}; touch {output}", who=who, output=who + ".txt")
+                for who in ("alice", "bob")]
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+def _records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+# --------------------------------------------------------------------
+def test_report_has_a_record_per_job(bake):
+    bake.write(GREETINGS)
+    result = bake.run("--report", "report.jsonl")
+    assert result.returncode == 0, result.stdout
+
+    header, *jobs, summary = _records(bake.path / "report.jsonl")
+    assert header["type"] == "BuildReport"
+    assert summary["type"] == "BuildSummary"
+    assert summary["succeeded"]
+    assert (summary["jobs"], summary["failures"]) == (2, 0)
+
+    output = (bake.path / "report.jsonl.output").read_bytes()
+    lines = []
+    for job in jobs:
+        assert job["type"] == "ShellReport"
+        assert job["succeeded"]
+        assert "out" not in job
+        ref = job["output"]
+        assert ref["file"] == "report.jsonl.output"
+        chunk = output[ref["offset"]:].splitlines()[:ref["lines"]]
+        lines.extend(json.loads(line)["line"].strip() for line in chunk)
+    assert sorted(lines) == ["hello alice", "hello bob"]
+
+
+# --------------------------------------------------------------------
+def test_report_records_failures(bake):
+    bake.write("""
+        from panifex import build, sh, default
+
+        @default
+        def broken():
+            return sh("echo oops; exit 3")
+
+        build()
+    """)
+    result = bake.run("--report", "report.jsonl")
+    assert result.returncode == 1, result.stdout
+
+    _, job, summary = _records(bake.path / "report.jsonl")
+    assert not job["succeeded"]
+    assert job["returncode"] == 3
+    assert not summary["succeeded"]
+    assert (summary["jobs"], summary["failures"]) == (1, 1)
@@ -0,0 +1,37 @@
+# --------------------------------------------------------------------
+# test_shell_env.py: Tests for the environments of shell recipes.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+
+
+# --------------------------------------------------------------------
+def test_recipes_see_the_environment_they_were_made_with(bake):
+    bake.write("""
+        from panifex import build, sh, default
+
+        sh.env(GREETING="hello")
+
+        @default
+        def greetings():
+            overlay = sh("echo $GREETING > {output}", output="overlay.txt")
+            overlay.with_env({"GREETING": "hi"})
+            shared = sh("echo $GREETING > {output}", output="shared.txt")
+            sh.env(GREETING="hey")
+            changed = sh("echo $GREETING > {output}", output="changed.txt")
+            return [overlay, shared, changed]
+
+        build()
+    """)
+    result = bake.run()
+    assert result.returncode == 0, result.stdout
+
+    def greeting(name):
+        return (bake.path / name).read_text().strip()
+
+    assert greeting("overlay.txt") == "hi"
+    assert greeting("shared.txt") == "hello"
+    assert greeting("changed.txt") == "hey"
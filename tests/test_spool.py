@@ -0,0 +1,25 @@
+# --------------------------------------------------------------------
+# test_spool.py: Tests for the spooling output sink.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+from panifex.shell import SpoolOutputSink
+
+
+# --------------------------------------------------------------------
+def test_spooled_lines_keep_carriage_returns(tmp_path):
+    sink = SpoolOutputSink(max_lines=1, dir=str(tmp_path))
+    sink.out("10%\r50%\r100%")
+    sink.err("\rwarning")
+    sink.out("done")
+
+    lines = list(sink.output())
+    assert sink.spooled == 2
+    assert [(line.stderr, line.line) for line in lines] == [
+        (False, "10%\r50%\r100%"),
+        (True, "\rwarning"),
+        (False, "done"),
+    ]
@@ -0,0 +1,93 @@
+# --------------------------------------------------------------------
+# test_watch.py: Tests for rebuilding in watch mode.
+#
+# Author: Lain Musgrove (lain.proliant@gmail.com)
+# Date: Friday October 16, 2026
+#
+# Distributed under terms of the MIT license.
+# --------------------------------------------------------------------
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, List
+
+# --------------------------------------------------------------------
+SCRIPT = """
+    from panifex import build, sh, default, target, FileSet
+
+    @target
+    def sources():
+        return sh("ls src > {output}", input=FileSet("src/*.c"), output="sources.txt")
+
+    @target
+    def data():
+        return sh("ls -R data > {output}", input="data", output="data.txt")
+
+    @default
+    def all(sources, data):
+        pass
+
+    build()
+"""
+
+
+# --------------------------------------------------------------------
+class Output:
+    """Collects the output of a running process line by line."""
+
+    def __init__(self, proc: subprocess.Popen):
+        self.lines: List[str] = []
+        self._thread = threading.Thread(target=self._read, args=(proc,), daemon=True)
+        self._thread.start()
+
+    def _read(self, proc: subprocess.Popen):
+        assert proc.stdout is not None
+        for line in proc.stdout:
+            self.lines.append(line)
+
+    def count(self, text: str) -> int:
+        return sum(1 for line in list(self.lines) if text in line)
+
+    def wait_for(self, condition: Callable[[], bool], timeout: float = 20):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "".join(self.lines)
+            time.sleep(0.05)
+
+
+# --------------------------------------------------------------------
+def test_watch_rebuilds_new_and_nested_inputs(bake):
+    bake.write(SCRIPT)
+    (bake.path / "src").mkdir()
+    (bake.path / "src" / "a.c").write_text("a\n")
+    (bake.path / "data").mkdir()
+    (bake.path / "data" / "x").write_text("x\n")
+
+    def contents(name: str) -> str:
+        path = bake.path / name
+        return path.read_text() if path.exists() else ""
+
+    proc = bake.start("-w")
+    try:
+        output = Output(proc)
+        output.wait_for(lambda: output.count("Watching") == 1)
+        assert "a.c" in contents("sources.txt")
+
+        # A new file matching the FileSet.
+        (bake.path / "src" / "b.c").write_text("b\n")
+        output.wait_for(lambda: output.count("Watching") == 2)
+        assert "b.c" in contents("sources.txt")
+
+        # A change inside a new directory in a directory input.
+        (bake.path / "data" / "sub").mkdir()
+        (bake.path / "data" / "sub" / "y").write_text("y\n")
+        output.wait_for(lambda: "y" in contents("data.txt").split())
+
+        # The new directory is watched from then on.
+        (bake.path / "data" / "sub" / "z").write_text("z\n")
+        output.wait_for(lambda: "z" in contents("data.txt").split())
+
+    finally:
+        proc.send_signal(signal.SIGINT)
+        proc.wait(timeout=10)